@@ -1,13 +1,23 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import os
-import time
+import functools
+import uuid
 from datetime import datetime, timedelta, date
-import json
 import calendar
 import streamlit.components.v1 as components
 
+# 核心逻辑都在 command_center 包里 (不依赖 Streamlit)；这里只是界面层，Plotly 在画图时才导入
+from command_center import (
+    ALL_PROJECTS, CATEGORY_LIST, DEFAULT_WORKSPACE, GANTT_DETAIL_DAYS, GANTT_GROUPS, GANTT_PAGE_ROWS, NEW_TASK_DEFAULTS, PROFILE_ENV, PROFILE_FILE,
+    PROFILER, REPORT_FORMATS, REPORT_GROUPS, REPORT_RANGES, STATUS_LIST, QuadrantIndex, build_gantt,
+    build_quadrant, cached_view, create_workspace, editor_patch, gantt_rows, gantt_zoomed_out, generate_pid, get_rollups,
+    get_write_behind, list_workspaces, normalize_subtasks, parse_weight, peek_pid, profiled, progress_as_of, report_bytes, report_frame, report_range,
+    search_tasks, set_workspace, use_workspace, workspace_summaries,
+)
+
+# 写时复制：各面板拿到的是缓存帧的廉价副本，改动时才真正复制 (只在界面进程里打开，不改变导入核心包的其他程序)
+pd.set_option("mode.copy_on_write", True)
+
 # --- 1. 基础配置 ---
 st.set_page_config(
     page_title="Personal Command Center",
@@ -19,6 +29,16 @@ st.set_page_config(
 # --- 2. 状态初始化 ---
 if "current_view" not in st.session_state: st.session_state.current_view = "dashboard"
 if "selected_task_index" not in st.session_state: st.session_state.selected_task_index = None
+if "writer_session" not in st.session_state: st.session_state.writer_session = uuid.uuid4().hex
+if "workspace" not in st.session_state: st.session_state.workspace = DEFAULT_WORKSPACE
+# 本会话只载入当前工作区；数据缓存、搜索索引和写入队列都按工作区分开
+set_workspace(st.session_state.workspace)
+
+# 写入走后台队列：提交后立即重跑，读取叠加了排队中的改动；落盘由后台线程合并完成
+writer, session_id = get_write_behind(), st.session_state.writer_session
+get_data, get_logs = writer.get_data, writer.get_logs
+# 任务帧里的日期是 datetime64，表格里只显示到天
+DATE_COLUMN = st.column_config.DateColumn(format="YYYY-MM-DD")
 
 # --- 3. 样式优化 ---
 st.markdown("""
@@ -67,49 +87,8 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# --- 4. 数据管理 ---
-DATA_FILE = "life_data.csv"
-LOG_FILE = "project_logs.csv"
-
-CATEGORY_MAP = {"学术": "STUDY", "大模型": "LLM", "工作": "WORK", "兴趣": "LIFE"}
-CATEGORY_LIST = list(CATEGORY_MAP.keys())
-
-def get_data():
-    cols = ["任务名称", "类别", "重要性(1-10)", "紧急性(1-10)", "当前进度(%)", "状态", "开始时间", "截止日期", "备注", "任务分解JSON", "专属笔记", "项目编号"]
-    if not os.path.exists(DATA_FILE): return pd.DataFrame(columns=cols)
-    try: df = pd.read_csv(DATA_FILE)
-    except: return pd.DataFrame(columns=cols)
-    for col in cols: 
-        if col not in df.columns: df[col] = ""
-    
-    df["开始时间"] = pd.to_datetime(df["开始时间"], errors='coerce').fillna(pd.Timestamp.now()).dt.date
-    df["截止日期"] = pd.to_datetime(df["截止日期"], errors='coerce').fillna(pd.Timestamp.now()+timedelta(7)).dt.date
-    return df
-
-def save_data(new_df): new_df.to_csv(DATA_FILE, index=False)
-
-def get_logs():
-    cols = ["日期", "项目", "子任务", "内容", "贡献进度"]
-    if not os.path.exists(LOG_FILE): return pd.DataFrame(columns=cols)
-    return pd.read_csv(LOG_FILE)
-
-def save_log_entry(date_str, project, subtask, content, prog_incr):
-    new = pd.DataFrame([[date_str, project, subtask, content, prog_incr]], columns=["日期", "项目", "子任务", "内容", "贡献进度"])
-    if os.path.exists(LOG_FILE): new.to_csv(LOG_FILE, mode='a', header=False, index=False)
-    else: new.to_csv(LOG_FILE, index=False)
-
-def generate_pid(df, category):
-    prefix = CATEGORY_MAP.get(category, "PROJ")
-    existing = df[df["项目编号"].str.startswith(prefix, na=False)]
-    if existing.empty: next_num = 1
-    else:
-        try:
-            max_id = existing["项目编号"].str.extract(r'(\d+)').astype(float).max().iloc[0]
-            next_num = int(max_id) + 1 if not pd.isna(max_id) else 1
-        except: next_num = len(existing) + 1
-    return f"{prefix}-{next_num:02d}"
-
-# --- 5. 组件 ---
+# --- 4. 组件 ---
+@profiled()
 def render_calendar():
     now = datetime.now()
     year, month = now.year, now.month
@@ -162,16 +141,111 @@ def live_clock_component():
         """, height=140
     )
 
+# --- 5. 局部刷新 ---
+# 侧边栏表单、主区各标签页、详情页、右侧工具栏各自是独立片段 (st.fragment)，
+# 组件交互只重跑所在片段，数据统一从缓存数据层读取；只有数据落盘或切换视图时才整页重跑。
+def _data_changed(msg=None):
+    if msg: st.session_state.flash = msg
+    st.rerun()
+
+def _editor_source(key, df):
+    # 编辑记录里的行号对应上一次渲染出来的表：其间别的会话改过数据时，仍按用户看到的那张表解析补丁
+    prev = st.session_state.get(f"_{key}_source")
+    st.session_state[f"_{key}_source"] = df
+    return prev if prev is not None and st.session_state.get(key) else df
+
+def fragment(fn):
+    # 片段单独重跑时不经过页面开头，先切回本会话的工作区
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        with use_workspace(st.session_state.workspace): return fn(*args, **kwargs)
+    return st.fragment(inner)
+
+def _open_detail(idx):
+    st.session_state.selected_task_index = idx
+    st.session_state.current_view = "detail"
+    st.rerun()
+
+if "flash" in st.session_state: st.toast(st.session_state.pop("flash"))
+# 后台写入的结果 (冲突、失败) 回到提交它的会话
+for note in writer.notes(session_id): st.toast(note)
+
+def _profiling(): return PROFILE_ENV or st.query_params.get("profile") == "1"
+
+def panel(name):
+    # 面板 span；只重跑这个片段时单独记录一次，并把耗时写在面板底部
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if PROFILER.on:
+                with PROFILER.span(name): return fn(*args, **kwargs)
+            if not _profiling(): return fn(*args, **kwargs)
+            PROFILER.begin(f"片段 {name}")
+            try: return fn(*args, **kwargs)
+            finally:
+                spans = PROFILER.end()
+                PROFILER.write_trace(spans)
+                st.caption(f"⏱️ {name}: {spans[0][2]:.1f} ms")
+        return inner
+    return wrap
+
+def render_profile(spans):
+    # 本次运行的瀑布图 + 按名称汇总的耗时
+    total = spans[0][2]
+    with st.expander(f"⏱️ 本次运行 {total:.0f} ms", expanded=False):
+        rows = sorted(spans, key=lambda s: s[1])
+        import plotly.express as px
+        wf = pd.DataFrame([[f"{i:02d} {'· ' * (depth - 1)}{name}", start, dur] for i, (name, start, dur, depth) in enumerate(rows)],
+                          columns=["区间", "开始(ms)", "耗时(ms)"])
+        fig = px.bar(wf, x="耗时(ms)", base="开始(ms)", y="区间", orientation="h", height=120 + len(wf) * 18)
+        fig.update_yaxes(autorange="reversed", title=None)
+        fig.update_layout(margin=dict(l=10,r=10,t=10,b=10), font=dict(size=11))
+        st.plotly_chart(fig, use_container_width=True)
+        agg = pd.DataFrame(spans[1:], columns=["区间", "开始", "耗时(ms)", "层级"]).groupby("区间")["耗时(ms)"].agg(["count", "sum", "max"])
+        st.dataframe(agg.sort_values("sum", ascending=False).round(2), use_container_width=True)
+        st.caption(f"完整记录已追加到 {PROFILE_FILE}")
+
+def current_tasks():
+    # 当前搜索条件下的任务视图：(过滤后的任务, 搜索命中 or None)
+    df = get_data()
+    query = st.session_state.get("search_query", "")
+    if not query: return df, None
+    hits = search_tasks(query, include_optional=st.session_state.get("search_deep", False))
+    return df[df["项目编号"].isin([pid for pid, _, _ in hits])], hits
+
 # --- 6. 左侧侧边栏 ---
-with st.sidebar:
-    st.title("➕ 新建任务")
-    
+def _switch_workspace(name):
+    # 在回调里切换 (先于下一次运行)：回到仪表盘，丢掉上一个工作区的选中任务、搜索词和表格编辑记录
+    st.session_state.workspace, st.session_state.workspace_pick = name, name
+    st.session_state.current_view, st.session_state.selected_task_index, st.session_state.search_query = "dashboard", None, ""
+    for key in [k for k in st.session_state if k.endswith("_editor") or (k.startswith("_") and k.endswith("_source"))]: del st.session_state[key]
+
+def _create_workspace():
+    name = st.session_state.new_workspace.strip()
+    st.session_state.new_workspace = ""
+    if not name: return
+    try: _switch_workspace(create_workspace(name))
+    except ValueError as e: st.session_state.flash = f"❌ {e}"
+    else: st.session_state.flash = f"✅ 已切换到工作区 {name}"
+
+@profiled()
+def workspace_panel():
+    st.session_state.workspace_pick = st.session_state.workspace
+    st.selectbox("🗂️ 工作区", list_workspaces(), key="workspace_pick", on_change=lambda: _switch_workspace(st.session_state.workspace_pick))
+    st.text_input("新建工作区", placeholder="输入名称后回车，创建并切换", key="new_workspace", on_change=_create_workspace,
+                  label_visibility="collapsed")
+    # 概览只读各工作区存下的汇总行，不载入其他工作区的数据
+    if st.toggle("全部工作区概览", key="workspace_overview"):
+        st.dataframe(workspace_summaries(), use_container_width=True, hide_index=True)
+
+@fragment
+@panel("侧边栏")
+def add_task_form():
     with st.form("add_task_form"):
         nm = st.text_input("任务名称", placeholder="例如：ICIS论文投稿")
         cat = st.selectbox("分类", CATEGORY_LIST)
         
-        df_preview = get_data()
-        auto_pid = generate_pid(df_preview, cat)
+        auto_pid = peek_pid(cat)
         st.info(f"🆔 ID: **{auto_pid}**")
         pid_hidden = st.text_input("PID", value=auto_pid, disabled=True, label_visibility="collapsed")
 
@@ -202,58 +276,252 @@ with st.sidebar:
         
         if st.form_submit_button("🚀 立即创建", type="primary"):
             if nm:
-                js = []
                 valid = subs[subs["子任务名称"].str.strip() != ""]
-                for idx, row in valid.iterrows():
-                    sub_id = f"{auto_pid}-{idx+1:02d}"
-                    js.append({"id": sub_id, "name": row["子任务名称"], "weight": int(row["权重"]), "done": False})
+                new_subs = [{"name": row["子任务名称"], "weight": int(row["权重"]), "done": False} for _, row in valid.iterrows()]
+                
+                final_pid = generate_pid(cat)
+                writer.add_task({
+                    "任务名称": nm, "类别": cat, "重要性(1-10)": imp, "紧急性(1-10)": urg,
+                    "当前进度(%)": 0, "状态": "未开始",
+                    "开始时间": s_d, "截止日期": e_d,
+                    "项目编号": final_pid, 
+                    "备注": "", "专属笔记": ""
+                }, new_subs, session=session_id)
+                _data_changed(f"✅ 任务 {final_pid} 已创建")
+
+# --- 7. 主控区 ---
+@fragment
+@panel("仪表盘")
+def dashboard_tab():
+    df, _ = current_tasks()
+    if not df.empty:
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("总任务", len(df))
+        k2.metric("进行中", len(df[df["状态"]=="进行中"]))
+        k3.metric("高优", len(df[df["重要性(1-10)"]>=8]))
+        k4.metric("平均进度", f"{df['当前进度(%)'].mean():.0f}%")
+        
+        st.write("")
+        with st.container(border=True):
+            st.subheader("🎯 四象限 (点击圆点进入详情)")
+            pids = tuple(df["项目编号"])
+            qi = cached_view("quadrant", pids, lambda: QuadrantIndex(df), df)
+            fig = cached_view("quadrant_fig", pids, lambda: build_quadrant(df, qi), df)
+            
+            # 点击任意点 -> 按坐标查格子；格子里只有一个任务直接进详情，否则列出同格任务
+            with PROFILER.span("渲染 四象限"): ev = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points")
+            if ev.selection["points"]:
+                pt = ev.selection["points"][0]
+                cell = qi.lookup(pt.get("x"), pt.get("y"))
+                if len(cell) == 1: _open_detail(cell[0])
+                elif cell:
+                    st.caption(f"📍 紧急性 {pt['x']} / 重要性 {pt['y']} 共有 {len(cell)} 个任务，点选一行进入详情：")
+                    drill = df.loc[cell, ["项目编号", "任务名称", "类别", "状态", "截止日期"]]
+                    pick = st.dataframe(drill, use_container_width=True, hide_index=True, selection_mode="single-row", on_select="rerun",
+                                        column_config={"截止日期": DATE_COLUMN})
+                    if pick.selection.rows: _open_detail(drill.index[pick.selection.rows[0]])
+        
+        st.write("")
+        with st.container(border=True):
+            st.subheader("📈 进度趋势")
+            rollup = get_rollups()
+            if rollup.days and not df.empty:
+                tp1, tp2 = st.columns([2, 1])
+                names = dict(zip(df["项目编号"], df["任务名称"]))
+                trend_proj = tp1.selectbox("选择项目查看趋势", [ALL_PROJECTS, *names], format_func=lambda p: names.get(p, p))
+                trend_range = tp2.selectbox("时间范围", ["全部", "近30天", "近90天", "近一年"])
+                start = None if trend_range == "全部" else date.today() - timedelta({"近30天": 30, "近90天": 90, "近一年": 365}[trend_range])
+                proj_logs = rollup.series(trend_proj, start=start)
+                if not proj_logs.empty:
+                    if trend_proj == ALL_PROJECTS:
+                        # 组合燃起图：各项目累计贡献之和折算成平均进度
+                        proj_logs["累计进度"] = proj_logs["累计进度"] / max(len(get_data()), 1)
+                    with PROFILER.span("渲染 燃起图"):
+                        import plotly.express as px
+                        fig_burn = px.line(proj_logs, x="日期", y="累计进度", markers=True)
+                        fig_burn.update_yaxes(range=[0, 105])
+                        st.plotly_chart(fig_burn, use_container_width=True)
+                else:
+                    st.caption("该项目暂无日志，去右侧添加一点吧！")
+            else:
+                st.caption("暂无日志数据")
+
+        st.write("")
+        st.subheader("📋 快速列表")
+        st.data_editor(
+            df[["任务名称", "类别", "截止日期", "状态", "当前进度(%)"]],
+            column_config={
+                "当前进度(%)": st.column_config.ProgressColumn(format="%d%%", min_value=0, max_value=100),
+                "状态": st.column_config.SelectboxColumn(options=STATUS_LIST),
+                "截止日期": DATE_COLUMN,
+            },
+            use_container_width=True, hide_index=True, key="quick_editor"
+        )
+        patch = editor_patch(_editor_source("quick_editor", df), st.session_state.get("quick_editor"))
+        if writer.apply_patch(patch, session=session_id):
+            del st.session_state["quick_editor"]
+            _data_changed()
+    else:
+        st.info("👈 左侧还没数据，或搜索无结果")
+
+@fragment
+@panel("甘特图")
+def gantt_tab():
+    df, _ = current_tasks()
+    if not df.empty:
+        st.subheader("📆 时间轴视图")
+        g1, g2, g3 = st.columns([1, 2, 1])
+        group_by = GANTT_GROUPS[g1.selectbox("分组", list(GANTT_GROUPS), key="gantt_group")]
+        span = (df["开始时间"].min().date(), df["截止日期"].max().date())
+        window = g2.date_input("时间窗口", value=span, key="gantt_window")
+        window = tuple(window) if len(window) == 2 else span
+        collapsed = st.multiselect("折叠分组", sorted(df[group_by].astype(str).unique()), key="gantt_collapsed") if group_by else []
+        
+        # 视图参数 + 任务数据版本 决定缓存键，翻页/切换分组时不重复构建
+        params = (tuple(df["项目编号"]), group_by, tuple(sorted(collapsed)), window)
+        rows = cached_view("gantt_rows", params, lambda: gantt_rows(df, group_by, collapsed, window), df)
+        pages = max(1, -(-len(rows) // GANTT_PAGE_ROWS))
+        page = g3.number_input(f"页码 (共 {pages} 页)", min_value=1, max_value=pages, value=1, key="gantt_page") - 1
+        if group_by and gantt_zoomed_out(window): st.caption(f"🔭 时间窗口超过 {GANTT_DETAIL_DAYS} 天，已按分组汇总；缩小窗口可展开到单个任务")
+        if rows.empty: st.caption("该时间窗口内没有任务")
+        else:
+            fig_g = cached_view("gantt", (*params, page), lambda: build_gantt(rows, page, window), df)
+            with PROFILER.span("渲染 甘特图"): st.plotly_chart(fig_g, use_container_width=True)
+        
+        st.subheader("📝 数据编辑器")
+        st.data_editor(
+            df,
+            column_config={
+                "开始时间": DATE_COLUMN,
+                "截止日期": DATE_COLUMN,
+                "状态": st.column_config.SelectboxColumn(options=STATUS_LIST),
+                "当前进度(%)": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%d%%"),
+                "项目编号": st.column_config.TextColumn(disabled=True)
+            },
+            num_rows="dynamic", use_container_width=True, height=500, key="gantt_editor"
+        )
+        patch = editor_patch(_editor_source("gantt_editor", df), st.session_state.get("gantt_editor"), NEW_TASK_DEFAULTS)
+        if writer.apply_patch(patch, session=session_id):
+            del st.session_state["gantt_editor"]
+            _data_changed("✅ 已保存")
+    else:
+        st.info("暂无数据")
+
+@fragment
+@panel("数据管理")
+def admin_tab():
+    df, _ = current_tasks()
+    st.subheader("🗑️ 项目管理")
+    with st.container(border=True):
+        st.write("**方式1：下拉删除**")
+        to_delete = st.selectbox("选择任务", df["任务名称"].unique(), index=None, placeholder="请选择...")
+        if to_delete:
+            if st.button(f"删除 {to_delete}", type="primary"):
+                writer.apply_patch({"updates": [], "added": [], "deleted": list(df.loc[df["任务名称"] == to_delete, "项目编号"])}, session=session_id)
+                _data_changed("删除成功！")
+    st.write("**方式2：表格选中删除 (选中行号 -> Delete)**")
+    st.data_editor(df, column_config={"开始时间": DATE_COLUMN, "截止日期": DATE_COLUMN}, disabled=["项目编号"], num_rows="dynamic",
+                   use_container_width=True, key="admin_editor")
+    patch = editor_patch(_editor_source("admin_editor", df), st.session_state.get("admin_editor"), NEW_TASK_DEFAULTS)
+    if writer.apply_patch(patch, session=session_id):
+        del st.session_state["admin_editor"]
+        _data_changed()
+
+@fragment
+@panel("详情页")
+def detail_view():
+    idx = st.session_state.selected_task_index
+    full_df = get_data()
+    if idx is not None and idx in full_df.index:
+        task = full_df.loc[idx]
+        if st.button("⬅️ 返回看板"):
+            st.session_state.current_view = "dashboard"
+            st.rerun()
+        
+        with st.container(border=True):
+            st.title(task["任务名称"])
+            c1, c2, c3, c4 = st.columns(4)
+            c1.info(f"ID: {task['项目编号']}")
+            c2.warning(f"截止: {task['截止日期']:%Y-%m-%d}")
+            c3.error(f"状态: {task['状态']}")
+            c4.metric("进度", f"{task['当前进度(%)']}%")
+            st.progress(int(task["当前进度(%)"])/100)
+            h1, h2 = st.columns([1, 3])
+            as_of = h1.date_input("回看某日进度", value=date.today(), label_visibility="collapsed")
+            h2.caption(f"🕰️ 截至 {as_of} 的进度: **{progress_as_of(task['项目编号'], as_of)}%**")
+            st.divider()
+            
+            cm, cn = st.columns([1.5, 1])
+            with cm:
+                st.subheader("✅ 子任务 (可直接删除)")
+                subs = writer.subtasks(task["项目编号"])
+                
+                if subs: sub_df = pd.DataFrame(subs)
+                else: sub_df = pd.DataFrame(columns=["id", "name", "weight", "done"])
+
+                edited_subs = st.data_editor(
+                    sub_df,
+                    column_config={
+                        "done": st.column_config.CheckboxColumn("完成", width="small"),
+                        "name": st.column_config.TextColumn("子任务名", width="medium"),
+                        "weight": st.column_config.NumberColumn("权重", width="small"),
+                        "id": st.column_config.TextColumn("ID", disabled=True, width="small")
+                    },
+                    num_rows="dynamic", use_container_width=True, hide_index=True
+                )
+                
+                new_subs = [x for x in edited_subs.to_dict(orient="records") if x.get("name") or parse_weight(x.get("weight"))]
+                # 只读比较：有新行或内容变了才保存，编号在保存时才领取 (渲染时不碰编号序列和它的文件锁)
+                if any(not x.get("id") or pd.isna(x["id"]) for x in new_subs) or normalize_subtasks(new_subs) != subs:
+                    writer.save_subtasks(task["项目编号"], new_subs, session=session_id)
+                    _data_changed()
                 
-                df_curr = get_data()
-                final_pid = generate_pid(df_curr, cat)
-                new_row = pd.DataFrame({
-                    "任务名称": [nm], "类别": [cat], "重要性(1-10)": [imp], "紧急性(1-10)": [urg],
-                    "当前进度(%)": [0], "状态": ["未开始"],
-                    "开始时间": [s_d], "截止日期": [e_d],
-                    "项目编号": [final_pid], 
-                    "备注": [""], "任务分解JSON": [json.dumps(js)], "专属笔记": [""]
-                })
-                save_data(pd.concat([df_curr, new_row], ignore_index=True))
-                st.toast(f"✅ 任务 {final_pid} 已创建")
-                time.sleep(0.5)
-                st.rerun()
-
-# --- 7. 核心布局 ---
-col_main, col_right = st.columns([3.5, 1], gap="medium")
-
-# === 中间主控区 ===
-with col_main:
+                st.divider()
+                st.subheader("📜 本项目更新日志")
+                # 只读含本项目的日志段
+                p_logs = get_logs(project=task["任务名称"])
+                if not p_logs.empty:
+                     st.dataframe(p_logs.sort_values("日期", ascending=False), use_container_width=True, hide_index=True)
+                else: st.caption("暂无记录")
+            
+            with cn:
+                st.subheader("📝 笔记")
+                n = st.text_area("内容", value=writer.get_note(task["项目编号"]), height=300)
+                if st.button("保存笔记"):
+                    writer.update_task(task["项目编号"], {"专属笔记": n}, session=session_id)
+                    _data_changed("已保存")
+    else:
+        st.session_state.current_view = "dashboard"
+        st.rerun()
+
+@fragment
+@panel("主控区")
+def main_panel():
     # 顶部区域
     c_h, c_clk = st.columns([1.5, 1])
     c_h.title("🚀 控制中心")
     
     # 搜索逻辑
-    search_query = c_h.text_input("🔍 全局搜索 (任务名/ID/子任务/类别)", placeholder="输入关键字...")
+    c_h.text_input("🔍 全局搜索 (任务名/ID/子任务/类别)", placeholder="输入关键字...", key="search_query")
+    c_h.checkbox("同时搜索笔记和日志", value=False, key="search_deep")
     
     with c_clk:
         live_clock_component()
 
-    df = get_data()
-    
     # 搜索执行
+    search_query = st.session_state.search_query
     if search_query:
-        mask = (
-            df["任务名称"].astype(str).str.contains(search_query, case=False, na=False) |
-            df["项目编号"].astype(str).str.contains(search_query, case=False, na=False) |
-            df["类别"].astype(str).str.contains(search_query, case=False, na=False) |
-            df["任务分解JSON"].astype(str).str.contains(search_query, case=False, na=False)
-        )
-        search_results = df[mask]
+        search_results, hits = current_tasks()
+        rank = {pid: (i, field) for i, (pid, field, _) in enumerate(hits)}
+        search_results = search_results.assign(匹配字段=search_results["项目编号"].map(lambda p: rank[p][1]))
+        search_results = search_results.iloc[search_results["项目编号"].map(lambda p: rank[p][0]).argsort()]
         
         if not search_results.empty:
             st.success(f"🔍 找到 {len(search_results)} 个匹配项，**点击下方表格选中行，即可跳转详情**：")
             
             search_event = st.dataframe(
-                search_results[["项目编号", "任务名称", "类别", "状态", "截止日期"]],
+                search_results[["项目编号", "任务名称", "类别", "状态", "截止日期", "匹配字段"]],
+                column_config={"截止日期": DATE_COLUMN},
                 use_container_width=True,
                 selection_mode="single-row", 
                 on_select="rerun",
@@ -261,281 +529,128 @@ with col_main:
             )
             
             if len(search_event.selection.rows) > 0:
-                selected_display_index = search_event.selection.rows[0]
-                real_index = search_results.index[selected_display_index]
-                st.session_state.selected_task_index = real_index
-                st.session_state.current_view = "detail"
-                st.rerun()
+                _open_detail(search_results.index[search_event.selection.rows[0]])
         else:
             st.warning(f"🤔 未找到包含 '{search_query}' 的任务")
 
-    # 如果有搜索，过滤下方视图
-    if search_query:
-        df = df[mask]
-
     if st.session_state.current_view == "dashboard":
         tab1, tab2, tab3 = st.tabs(["📊 仪表盘", "📅 项目甘特图", "🗂️ 数据管理"])
-        
-        # --- TAB 1: 看板 ---
-        with tab1:
-            if not df.empty:
-                k1, k2, k3, k4 = st.columns(4)
-                k1.metric("总任务", len(df))
-                k2.metric("进行中", len(df[df["状态"]=="进行中"]))
-                k3.metric("高优", len(df[df["重要性(1-10)"]>=8]))
-                k4.metric("平均进度", f"{df['当前进度(%)'].mean():.0f}%")
-                
-                st.write("")
-                with st.container(border=True):
-                    st.subheader("🎯 四象限 (点击圆点进入详情)")
-                    fig = px.scatter(df, x="紧急性(1-10)", y="重要性(1-10)", color="类别", text="任务名称", range_x=[0,11], range_y=[0,11], height=500)
-                    fig.add_shape(type="rect", x0=5.5, y0=5.5, x1=11, y1=11, fillcolor="rgba(255,0,0,0.1)", layer="below", line_width=0)
-                    fig.add_shape(type="rect", x0=0, y0=5.5, x1=5.5, y1=11, fillcolor="rgba(0,0,255,0.1)", layer="below", line_width=0)
-                    fig.add_shape(type="rect", x0=5.5, y0=0, x1=11, y1=5.5, fillcolor="rgba(255,165,0,0.1)", layer="below", line_width=0)
-                    fig.add_shape(type="rect", x0=0, y0=0, x1=5.5, y1=5.5, fillcolor="rgba(0,128,0,0.1)", layer="below", line_width=0)
-                    fig.update_traces(textposition='top center', marker=dict(size=18, line=dict(width=1, color='gray')))
-                    fig.update_layout(plot_bgcolor='white', xaxis=dict(showgrid=False), yaxis=dict(showgrid=False), margin=dict(l=20,r=20,t=20,b=20), font=dict(size=14))
-                    
-                    ev = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points")
-                    if ev.selection["points"]:
-                        clicked_idx = ev.selection["points"][0]["point_index"]
-                        st.session_state.selected_task_index = df.index[clicked_idx]
-                        st.session_state.current_view = "detail"
-                        st.rerun()
-                
-                st.write("")
-                with st.container(border=True):
-                    st.subheader("📈 进度趋势")
-                    logs = get_logs()
-                    if not logs.empty and not df.empty:
-                        trend_proj = st.selectbox("选择项目查看趋势", df["任务名称"].unique())
-                        proj_logs = logs[logs["项目"] == trend_proj].copy()
-                        if not proj_logs.empty:
-                            proj_logs["日期"] = pd.to_datetime(proj_logs["日期"])
-                            proj_logs = proj_logs.sort_values("日期")
-                            proj_logs["累计进度"] = proj_logs["贡献进度"].cumsum()
-                            fig_burn = px.line(proj_logs, x="日期", y="累计进度", markers=True)
-                            fig_burn.update_yaxes(range=[0, 105])
-                            st.plotly_chart(fig_burn, use_container_width=True)
-                        else:
-                            st.caption("该项目暂无日志，去右侧添加一点吧！")
-                    else:
-                        st.caption("暂无日志数据")
-
-                st.write("")
-                st.subheader("📋 快速列表")
-                edited_list = st.data_editor(
-                    df[["任务名称", "类别", "截止日期", "状态", "当前进度(%)"]],
-                    column_config={
-                        "当前进度(%)": st.column_config.ProgressColumn(format="%d%%", min_value=0, max_value=100),
-                        "状态": st.column_config.SelectboxColumn(options=["未开始", "进行中", "已完成", "暂停"]),
-                        "截止日期": st.column_config.DateColumn(format="YYYY-MM-DD"),
-                    },
-                    use_container_width=True, hide_index=True
-                )
-                if not edited_list.equals(df[["任务名称", "类别", "截止日期", "状态", "当前进度(%)"]]):
-                    df.update(edited_list)
-                    save_data(df)
-                    st.rerun()
-            else:
-                st.info("👈 左侧还没数据，或搜索无结果")
-
-        # --- TAB 2: 甘特图 ---
-        with tab2:
-            if not df.empty:
-                st.subheader("📆 时间轴视图")
-                fig_g = px.timeline(df, x_start="开始时间", x_end="截止日期", y="任务名称", color="状态", height=400+len(df)*20,
-                                    color_discrete_map={"已完成":"#28a745", "进行中":"#6f42c1", "未开始":"#999"})
-                fig_g.update_yaxes(autorange="reversed")
-                st.plotly_chart(fig_g, use_container_width=True)
-                
-                st.subheader("📝 数据编辑器")
-                edited_gantt = st.data_editor(
-                    df,
-                    column_config={
-                        "开始时间": st.column_config.DateColumn(format="YYYY-MM-DD"),
-                        "截止日期": st.column_config.DateColumn(format="YYYY-MM-DD"),
-                        "状态": st.column_config.SelectboxColumn(options=["未开始", "进行中", "已完成", "暂停"]),
-                        "当前进度(%)": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%d%%"),
-                        "项目编号": st.column_config.TextColumn(disabled=True)
-                    },
-                    num_rows="dynamic", use_container_width=True, height=500
-                )
-                if not edited_gantt.equals(df):
-                    save_data(edited_gantt)
-                    st.toast("✅ 已保存")
-                    time.sleep(0.5)
-                    st.rerun()
-            else:
-                st.info("暂无数据")
-
-        # --- TAB 3: 数据管理 ---
-        with tab3:
-            st.subheader("🗑️ 项目管理")
-            with st.container(border=True):
-                st.write("**方式1：下拉删除**")
-                to_delete = st.selectbox("选择任务", df["任务名称"].unique(), index=None, placeholder="请选择...")
-                if to_delete:
-                    if st.button(f"删除 {to_delete}", type="primary"):
-                        df = df[df["任务名称"] != to_delete]
-                        save_data(df)
-                        st.success("删除成功！")
-                        time.sleep(1)
-                        st.rerun()
-            st.write("**方式2：表格选中删除 (选中行号 -> Delete)**")
-            edited_admin = st.data_editor(df, num_rows="dynamic", use_container_width=True, key="admin_editor")
-            if not edited_admin.equals(df):
-                save_data(edited_admin)
-                st.rerun()
-
-    # === Detail ===
+        with tab1: dashboard_tab()
+        with tab2: gantt_tab()
+        with tab3: admin_tab()
     elif st.session_state.current_view == "detail":
-        idx = st.session_state.selected_task_index
-        full_df = get_data()
-        if idx is not None and idx in full_df.index:
-            task = full_df.loc[idx]
-            if st.button("⬅️ 返回看板"):
-                st.session_state.current_view = "dashboard"
-                st.rerun()
-            
-            with st.container(border=True):
-                st.title(task["任务名称"])
-                c1, c2, c3, c4 = st.columns(4)
-                c1.info(f"ID: {task['项目编号']}")
-                c2.warning(f"截止: {task['截止日期']}")
-                c3.error(f"状态: {task['状态']}")
-                c4.metric("进度", f"{task['当前进度(%)']}%")
-                st.progress(int(task["当前进度(%)"])/100)
-                st.divider()
-                
-                cm, cn = st.columns([1.5, 1])
-                with cm:
-                    st.subheader("✅ 子任务 (可直接删除)")
-                    try: subs = json.loads(task["任务分解JSON"])
-                    except: subs = []
-                    
-                    if subs: sub_df = pd.DataFrame(subs)
-                    else: sub_df = pd.DataFrame(columns=["id", "name", "weight", "done"])
-
-                    edited_subs = st.data_editor(
-                        sub_df,
-                        column_config={
-                            "done": st.column_config.CheckboxColumn("完成", width="small"),
-                            "name": st.column_config.TextColumn("子任务名", width="medium"),
-                            "weight": st.column_config.NumberColumn("权重", width="small"),
-                            "id": st.column_config.TextColumn("ID", disabled=True, width="small")
-                        },
-                        num_rows="dynamic", use_container_width=True, hide_index=True
-                    )
-                    
-                    new_subs_json = edited_subs.to_dict(orient="records")
-                    if json.dumps(new_subs_json) != task["任务分解JSON"]:
-                        full_df.at[idx, "任务分解JSON"] = json.dumps(new_subs_json)
-                        total_w = sum(int(x['weight']) for x in new_subs_json)
-                        done_w = sum(int(x['weight']) for x in new_subs_json if x['done'])
-                        new_prog = min(int((done_w/total_w)*100), 100) if total_w > 0 else 0
-                        full_df.at[idx, "当前进度(%)"] = new_prog
-                        save_data(full_df)
-                        st.rerun()
-                    
-                    st.divider()
-                    st.subheader("📜 本项目更新日志")
-                    all_logs = get_logs()
-                    if not all_logs.empty:
-                        p_logs = all_logs[all_logs["项目"] == task["任务名称"]]
-                        if not p_logs.empty:
-                             st.dataframe(p_logs.sort_values("日期", ascending=False), use_container_width=True, hide_index=True)
-                        else: st.caption("暂无记录")
-                
-                with cn:
-                    st.subheader("📝 笔记")
-                    n = st.text_area("内容", value=str(task["专属笔记"]), height=300)
-                    if st.button("保存笔记"):
-                        full_df.at[idx, "专属笔记"] = n
-                        save_data(full_df)
-                        st.success("已保存")
-        else:
-            st.session_state.current_view = "dashboard"
-            st.rerun()
+        detail_view()
 
-# ==========================================
-# 右侧固定工具栏
-# ==========================================
-with col_right:
-    # 1. 真实日历 (仅展示)
-    with st.container(border=True):
-        render_calendar()
+# --- 8. 右侧固定工具栏 ---
+@fragment
+@panel("每日更新")
+def daily_update_panel():
+    st.subheader("📝 每日更新")
+    # === 核心修改：日期选择器移入此处 ===
+    log_date = st.date_input("1. 选择日期", value=datetime.now())
     
-    # 2. 每日更新 (日期选择器在这里)
-    with st.container(border=True):
-        st.subheader("📝 每日更新")
-        # === 核心修改：日期选择器移入此处 ===
-        log_date = st.date_input("1. 选择日期", value=datetime.now())
+    full_df_right = get_data()
+    
+    if not full_df_right.empty:
+        task_list = full_df_right["任务名称"].unique()
+        selected_task_name = st.selectbox("2. 选择项目", task_list)
         
-        full_df_right = get_data()
+        selected_row = full_df_right[full_df_right["任务名称"] == selected_task_name].iloc[0]
+        sub_data = writer.subtasks(selected_row["项目编号"])
+        sub_names = [s["name"] for s in sub_data]
         
-        if not full_df_right.empty:
-            task_list = full_df_right["任务名称"].unique()
-            selected_task_name = st.selectbox("2. 选择项目", task_list)
+        if sub_names:
+            selected_sub_name = st.selectbox("3. 选择子任务", sub_names)
+            current_sub = next((s for s in sub_data if s["name"] == selected_sub_name), None)
+            max_w = int(current_sub["weight"]) if current_sub else 100
+            st.info(f"该子任务权重: **{max_w}%**")
             
-            selected_row = full_df_right[full_df_right["任务名称"] == selected_task_name].iloc[0]
-            try: 
-                sub_data = json.loads(selected_row["任务分解JSON"])
-                sub_names = [s["name"] for s in sub_data]
-            except: 
-                sub_data = []
-                sub_names = []
+            log_content = st.text_area("4. 今日内容", height=80)
+            prog_incr = st.number_input("5. 贡献进度 (+%)", min_value=0, max_value=max_w, value=0)
             
-            if sub_names:
-                selected_sub_name = st.selectbox("3. 选择子任务", sub_names)
-                current_sub = next((s for s in sub_data if s["name"] == selected_sub_name), None)
-                max_w = int(current_sub["weight"]) if current_sub else 100
-                st.info(f"该子任务权重: **{max_w}%**")
-                
-                log_content = st.text_area("4. 今日内容", height=80)
-                prog_incr = st.number_input("5. 贡献进度 (+%)", min_value=0, max_value=max_w, value=0)
-                
-                if st.button("提交更新", type="primary"):
-                    save_log_entry(log_date.strftime("%Y-%m-%d"), selected_task_name, selected_sub_name, log_content, prog_incr)
-                    
-                    current_idx = full_df_right[full_df_right["任务名称"] == selected_task_name].index[0]
-                    new_total = min(full_df_right.at[current_idx, "当前进度(%)"] + prog_incr, 100)
-                    full_df_right.at[current_idx, "当前进度(%)"] = new_total
-                    save_data(full_df_right)
-                    st.success("已记录！")
-                    time.sleep(1)
-                    st.rerun()
-            else:
-                st.warning("无子任务，请先添加")
+            if st.button("提交更新", type="primary"):
+                writer.save_log_entry(log_date.strftime("%Y-%m-%d"), selected_task_name, selected_sub_name, log_content, prog_incr,
+                                      pid=selected_row["项目编号"], sub_id=current_sub["id"] if current_sub else None, session=session_id)
+                _data_changed("已记录！")
         else:
-            st.caption("暂无项目")
+            st.warning("无子任务，请先添加")
+    else:
+        st.caption("暂无项目")
 
-    # 3. 报表 & AI
-    with st.container(border=True):
-        st.subheader("📊 报表 & AI")
-        t_rep, t_ai = st.tabs(["📄 周报", "🤖 拆解"])
+@fragment
+@panel("报表")
+def report_panel():
+    st.subheader("📊 报表 & AI")
+    t_rep, t_ai = st.tabs(["📄 报表", "🤖 拆解"])
+    
+    with t_rep:
+        r1, r2 = st.columns(2)
+        rng = r1.selectbox("时间范围", REPORT_RANGES, key="report_range")
+        group_by = r2.selectbox("分组方式", REPORT_GROUPS, key="report_group")
+        if rng == "自定义":
+            picked = st.date_input("起止日期", value=(date.today() - timedelta(days=30), date.today()), key="report_dates")
+            start, end = picked if len(picked) == 2 else (picked[0], picked[0])
+        else: start, end = report_range(rng)
+        fmt = st.radio("格式", list(REPORT_FORMATS), horizontal=True, key="report_fmt")
+        
+        part = report_frame(start, end, group_by)
+        if not part.empty:
+            st.caption(f"{start} ~ {end}: {len(part)} 条记录")
+            # 点击下载时才在后台线程生成文件内容，不阻塞页面
+            title = f"{rng}工作汇报" if rng != "自定义" else f"工作汇报 ({start} ~ {end})"
+            ext, mime = REPORT_FORMATS[fmt]
+            st.download_button(f"📥 下载 {fmt}", lambda: report_bytes(part, fmt, title), f"report_{start}_{end}.{ext}", mime=mime)
+        else: st.warning("该时间段无记录")
+
+    with t_ai:
+        st.caption("AI任务拆解演示")
+        ai_input = st.text_input("任务目标", placeholder="例：准备答辩PPT")
+        if st.button("✨ AI 拆解"):
+            if ai_input:
+                st.code("1. 梳理逻辑 (20%)\n2. 制作初稿 (30%)\n3. 美化 (20%)\n4. 演练 (30%)")
+
+# --- 9. 核心布局 ---
+if _profiling(): PROFILER.begin("页面运行")
+profile = None
+try:
+    with st.sidebar:
+        workspace_panel()
+        st.title("➕ 新建任务")
+        add_task_form()
+
+    col_main, col_right = st.columns([3.5, 1], gap="medium")
+
+    # === 中间主控区 ===
+    with col_main:
+        main_panel()
+
+    # ==========================================
+    # 右侧固定工具栏
+    # ==========================================
+    with col_right:
+        # 1. 真实日历 (仅展示)
+        with st.container(border=True):
+            render_calendar()
         
-        with t_rep:
-            if st.button("生成本周周报"):
-                logs = get_logs()
-                if not logs.empty:
-                    logs["日期"] = pd.to_datetime(logs["日期"])
-                    start_date = pd.Timestamp.now() - pd.Timedelta(days=7)
-                    weekly_logs = logs[logs["日期"] >= start_date]
-                    if not weekly_logs.empty:
-                        report_md = f"# 📅 本周工作汇报\n生成: {datetime.now().strftime('%Y-%m-%d')}\n\n"
-                        for proj, group in weekly_logs.groupby("项目"):
-                            report_md += f"## 📌 {proj}\n"
-                            for _, row in group.iterrows():
-                                report_md += f"- **{row['日期'].strftime('%m-%d')}**: {row['内容']} (进度+{row['贡献进度']}%)\n"
-                            report_md += "\n"
-                        st.download_button("📥 下载 Markdown", report_md, "weekly_report.md")
-                    else: st.warning("本周无记录")
-                else: st.warning("无数据")
-
-        with t_ai:
-            st.caption("AI任务拆解演示")
-            ai_input = st.text_input("任务目标", placeholder="例：准备答辩PPT")
-            if st.button("✨ AI 拆解"):
-                if ai_input:
-                    st.code("1. 梳理逻辑 (20%)\n2. 制作初稿 (30%)\n3. 美化 (20%)\n4. 演练 (30%)")
\ No newline at end of file
+        # 2. 每日更新 (日期选择器在这里)
+        with st.container(border=True):
+            daily_update_panel()
+
+        # 3. 报表 & AI
+        with st.container(border=True):
+            report_panel()
+finally:
+    # 写入数据后的 st.rerun() 会中断本次运行：也要结束记录，避免 span 留到下一次
+    if PROFILER.on:
+        profile = PROFILER.end()
+        PROFILER.write_trace(profile)
+
+if profile:
+    with st.sidebar: render_profile(profile)
+
+# 本会话还有改动在排队时轮询 (放在页面最后，不挤动其他元素)；改动落盘后整页重跑一次，
+# 换上磁盘上的数据 (汇总、报表等不走叠加视图的部分) 并弹出冲突、失败消息
+def _write_watch():
+    if not writer.busy(session_id): st.rerun()
+
+if writer.busy(session_id): st.fragment(_write_watch, run_every=0.5)()
@@ -0,0 +1,221 @@
+"""性能基准：生成合成工作区，按数据规模计时 command_center 的真实代码路径和完整页面运行，结果写成 JSON 便于跨版本对比。
+
+    python benchmarks/bench.py --scale small medium
+    python benchmarks/bench.py --tasks 2000 --subtasks 6 --logs 100000 --years 4 --engine sqlite
+    python benchmarks/bench.py --scale medium --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+# 预设规模: (任务数, 每个任务的子任务数, 日志行数, 日志跨度年数)
+SCALES = {"small": (100, 4, 2_000, 1), "medium": (1_000, 5, 50_000, 3), "large": (5_000, 6, 200_000, 5)}
+CATEGORIES = {"学术": "STUDY", "大模型": "LLM", "工作": "WORK", "兴趣": "LIFE"}
+STATUSES = ["未开始", "进行中", "已完成", "暂停"]
+WORDS = ["论文", "实验", "模型", "评审", "答辩", "健身", "阅读", "部署", "数据", "汇报", "调研", "复盘"]
+
+
+# --- 1. 合成工作区 ---
+def make_workspace(path, tasks, subtasks, logs, years, seed=0):
+    # 在 path 下写出 life_data.csv (子任务放在旧版 任务分解JSON 列) 和 project_logs.csv
+    import pandas as pd
+    rng = random.Random(seed)
+    today = date.today()
+    first = today - timedelta(days=365 * years)
+    counters, task_rows, subs_of = {}, [], {}
+    for i in range(tasks):
+        cat = rng.choice(list(CATEGORIES))
+        counters[cat] = counters.get(cat, 0) + 1
+        pid = f"{CATEGORIES[cat]}-{counters[cat]:02d}"
+        start = first + timedelta(days=rng.randrange(365 * years))
+        weights = [100 // subtasks] * subtasks
+        weights[-1] += 100 - sum(weights)
+        subs = [{"id": f"{pid}-{k + 1:02d}", "name": f"{rng.choice(WORDS)}{k + 1}", "weight": w, "done": rng.random() < 0.3}
+                for k, w in enumerate(weights)]
+        name = f"{rng.choice(WORDS)}{rng.choice(WORDS)}-{i}"
+        subs_of[name] = subs
+        task_rows.append({
+            "任务名称": name, "类别": cat, "重要性(1-10)": rng.randint(1, 10), "紧急性(1-10)": rng.randint(1, 10),
+            "当前进度(%)": rng.randint(0, 100), "状态": rng.choice(STATUSES),
+            "开始时间": start.isoformat(), "截止日期": (start + timedelta(days=rng.randint(3, 120))).isoformat(),
+            "备注": "", "任务分解JSON": json.dumps(subs, ensure_ascii=False),
+            "专属笔记": f"{rng.choice(WORDS)}笔记 {i}", "项目编号": pid,
+        })
+    names = list(subs_of)
+    log_rows = []
+    for _ in range(logs):
+        name = rng.choice(names)
+        sub = rng.choice(subs_of[name])
+        day = first + timedelta(days=rng.randrange(365 * years + 1))
+        log_rows.append([day.isoformat(), name, sub["name"], f"{rng.choice(WORDS)}推进", rng.randint(0, 5)])
+    log_rows.sort(key=lambda r: r[0])
+    pd.DataFrame(task_rows).to_csv(os.path.join(path, "life_data.csv"), index=False)
+    pd.DataFrame(log_rows, columns=["日期", "项目", "子任务", "内容", "贡献进度"]).to_csv(os.path.join(path, "project_logs.csv"), index=False)
+
+
+# --- 2. 计时 ---
+def _timed(fn):
+    t = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t) * 1000
+
+def _measure(fn, repeat, cold=None):
+    # cold: 先清缓存再跑一次；随后 repeat 次热路径
+    out = {}
+    if cold is not None:
+        cold()
+        out["cold_ms"] = round(_timed(fn), 3)
+    runs = [_timed(fn) for _ in range(repeat)]
+    out.update({"min_ms": round(min(runs), 3), "median_ms": round(statistics.median(runs), 3)})
+    return out
+
+def _load_core():
+    # 直接导入核心包，不启动界面
+    sys.path.insert(0, ROOT)
+    import command_center
+    return command_center
+
+def _clear(cc): cc.clear_caches()
+
+def bench_scale(cc, path, repeat):
+    os.chdir(path)
+    _clear(cc)
+    cold = lambda: _clear(cc)
+    df = cc.get_data()
+    pid, name = df["项目编号"].iloc[len(df) // 2], df["任务名称"].iloc[len(df) // 2]
+    query = name[:2]
+    today = date.today()
+    start, end = cc.report_range("本季度", today)
+
+    def search_mask():
+        hits = cc.search_tasks(query, include_optional=True)
+        return cc.get_data()["项目编号"].isin([p for p, _, _ in hits])
+
+    def burn_up():
+        rollup = cc.get_rollups()
+        rollup.series(pid)
+        rollup.series(cc.ALL_PROJECTS, start=today - timedelta(days=90))
+
+    def weekly_report():
+        s, e = cc.report_range("近7天", today)
+        cc.report_bytes(cc.report_frame(s, e, "项目"), "Markdown", "近7天工作汇报")
+
+    def detail_progress():
+        cc.task_progress(pid)
+        cc.progress_as_of(pid, today - timedelta(days=180))
+
+    # 先把历史日志归档成冷段，之后的读取都在分层后的稳定状态下计时
+    results = {
+        "compact_logs": _measure(cc.compact_logs, 1),
+        "get_data": _measure(cc.get_data, repeat, cold),
+        "get_logs": _measure(cc.get_logs, repeat, cold),
+        "logs_30d": _measure(lambda: cc.get_logs(since=today - timedelta(days=30), until=today), repeat, cold),
+        "peek_pid": _measure(lambda: cc.peek_pid("学术"), repeat),
+        "search_mask": _measure(search_mask, repeat, cold),
+        "burn_up": _measure(burn_up, repeat, cold),
+        "weekly_report": _measure(weekly_report, repeat, cold),
+        "quarter_report": _measure(lambda: cc.report_bytes(cc.report_frame(start, end, "类别"), "CSV"), repeat),
+        "detail_progress": _measure(detail_progress, repeat, cold),
+        # 跨工作区概览：热路径只比对各工作区存下的汇总行的版本，不载入数据
+        "workspace_summary": _measure(cc.workspace_summaries, repeat, cold),
+    }
+    # 写路径放最后：会改动工作区文件
+    results["generate_pid"] = _measure(lambda: cc.generate_pid("学术"), repeat)
+    results["save_data"] = _measure(lambda: cc.save_data(cc.get_data()), repeat)
+    # 界面的写入走后台队列：这里计的是提交耗时，写入本身由后台线程合并完成
+    writer = cc.get_write_behind()
+    results["queued_update"] = _measure(lambda: writer.update_task(pid, {"备注": "bench"}), repeat)
+    writer.flush()
+    return results
+
+def bench_apptest(path, repeat, timeout):
+    from streamlit.testing.v1 import AppTest
+    os.chdir(path)
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    first = _timed(at.run)
+    if at.exception: return {"error": str(at.exception[0].message)}
+    runs = [_timed(at.run) for _ in range(repeat)]
+    return {"first_run_ms": round(first, 3), "min_ms": round(min(runs), 3), "median_ms": round(statistics.median(runs), 3)}
+
+
+# --- 3. 结果 ---
+def _meta(args):
+    import pandas as pd
+    import streamlit as st
+    try: rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError: rev = ""
+    return {"git": rev, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "platform": platform.platform(),
+            "pandas": pd.__version__, "streamlit": st.__version__, "engine": args.engine, "seed": args.seed, "repeat": args.repeat}
+
+def compare(old, new):
+    # 打印两次结果里同名 (规模, 操作) 的中位数对比
+    base = {(r["scale"], op): v for r in old["runs"] for op, v in r["results"].items()}
+    print(f"{'scale':<10}{'op':<18}{'old ms':>12}{'new ms':>12}{'ratio':>8}")
+    for r in new["runs"]:
+        for op, v in r["results"].items():
+            was = base.get((r["scale"], op), {})
+            if "median_ms" not in v or "median_ms" not in was: continue
+            ratio = v["median_ms"] / was["median_ms"] if was["median_ms"] else float("inf")
+            print(f"{r['scale']:<10}{op:<18}{was['median_ms']:>12.2f}{v['median_ms']:>12.2f}{ratio:>8.2f}")
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--scale", nargs="*", choices=list(SCALES), help="预设规模，可多选 (默认 small)")
+    p.add_argument("--tasks", type=int)
+    p.add_argument("--subtasks", type=int, default=5)
+    p.add_argument("--logs", type=int, default=10_000)
+    p.add_argument("--years", type=int, default=2)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--engine", choices=["csv", "sqlite"], default="csv")
+    p.add_argument("--no-apptest", action="store_true", help="跳过完整脚本运行计时")
+    p.add_argument("--apptest-timeout", type=float, default=300)
+    p.add_argument("--output", default=os.path.join(ROOT, "bench_output.json"))
+    p.add_argument("--compare", help="与之前的结果文件对比")
+    args = p.parse_args(argv)
+
+    scales = {"custom": (args.tasks, args.subtasks, args.logs, args.years)} if args.tasks else \
+             {s: SCALES[s] for s in (args.scale or ["small"])}
+    os.environ["PCC_STORAGE"] = args.engine
+    cwd = os.getcwd()
+    cc = None
+    report = {"meta": _meta(args), "runs": []}
+    for label, (tasks, subtasks, logs, years) in scales.items():
+        with tempfile.TemporaryDirectory(prefix=f"pcc-bench-{label}-") as path:
+            t = time.perf_counter()
+            make_workspace(path, tasks, subtasks, logs, years, args.seed)
+            gen_ms = (time.perf_counter() - t) * 1000
+            print(f"[{label}] {tasks} tasks x {subtasks} subtasks, {logs} logs / {years}y", flush=True)
+            if cc is None: cc = _load_core()
+            results = bench_scale(cc, path, args.repeat)
+            if not args.no_apptest:
+                # 上面的写路径改过工作区并留下了各种派生存储，完整运行换一个全新的目录重新生成
+                with tempfile.TemporaryDirectory(prefix=f"pcc-bench-{label}-app-") as app_path:
+                    make_workspace(app_path, tasks, subtasks, logs, years, args.seed)
+                    os.chdir(app_path)
+                    _clear(cc)
+                    cc.compact_logs()
+                    results["apptest_run"] = bench_apptest(app_path, args.repeat, args.apptest_timeout)
+                    os.chdir(cwd)
+            for op, v in results.items(): print(f"  {op:<18}{json.dumps(v)}")
+            report["runs"].append({"scale": label, "tasks": tasks, "subtasks": subtasks, "logs": logs, "years": years,
+                                   "generate_ms": round(gen_ms, 3), "results": results})
+            os.chdir(cwd)
+    with open(args.output, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""个人项目控制台的核心逻辑：存储、缓存、搜索、进度、报表与视图数据。
+
+不依赖 Streamlit，可以直接在脚本和测试里导入；数据文件按当前工作目录解析。
+"""
+from .caching import resource
+from .core import (ALL_PROJECTS, ALL_WORKSPACES, WORKSPACE_CACHE, WORKSPACE_SUMMARY_COLS, IdAllocator, ProgressEngine,
+                   ProgressRollup, SearchIndex, add_task, add_tasks, apply_patch, assign_subtask_ids, compact_logs, current_workspace,
+                   editor_patch, generate_pid, get_data, get_id_allocator, get_logs, get_note, get_notes, get_progress_engine, get_rollups,
+                   get_search_index, get_storage, get_subtask_store, log_totals, normalize_subtasks, peek_pid, preview_progress, progress_as_of,
+                   record_progress, save_data, save_log_entries, save_log_entry, save_subtasks, search_tasks, set_workspace, task_progress,
+                   update_task, use_workspace, workspace_summaries, workspace_summary)
+from .profiling import PROFILE_ENV, PROFILE_FILE, PROFILER, Profiler, profiled
+from .reports import (REPORT_FORMATS, REPORT_GROUPS, REPORT_RANGES, LogReport, get_log_report, iter_report_md, report_bytes,
+                      report_frame, report_range)
+from .storage import (CATEGORY_LIST, CATEGORY_MAP, DATA_FILE, DB_FILE, DEFAULT_WORKSPACE, LOG_ARCHIVE_DIR, LOG_COLS, LOG_FILE,
+                      LOG_HOT_DAYS, NEW_TASK_DEFAULTS, STATUS_LIST, STORAGE_ENGINE, SUBTASK_COLS, TASK_CATEGORIES, TASK_COLS, TASK_DATE_COLS,
+                      TASK_INT_RANGES, TASK_LAZY_COLS, WORKSPACE_DIR, CsvStorage, SqliteStorage, SubtaskStore, coerce_task_value,
+                      coerce_tasks, create_workspace, filter_logs, list_workspaces, migrate_csv_to_sqlite, open_storage, parse_weight)
+from .views import (GANTT_DETAIL_DAYS, GANTT_GROUPS, GANTT_PAGE_ROWS, QUADRANT_WEBGL_MIN, QuadrantIndex, build_gantt,
+                    build_quadrant, cached_view, gantt_rows, gantt_zoomed_out)
+from .writeback import WRITE_DELAY, WriteBehind, get_write_behind
+
+
+def clear_caches():
+    # 丢弃所有进程级缓存 (各工作区的存储连接、编号序列、解析好的数据和日志段、搜索索引、视图)；切换工作目录后调用
+    from . import core, views
+    for fn in (core._storage, core._id_allocator, core._file_cache, core._segment_cache, core._search_state, core._recent_workspaces,
+               views._view_cache): fn.clear()
@@ -0,0 +1,19 @@
+"""进程级共享缓存：作用同 st.cache_resource (跨 rerun / session 共享)，但不依赖 Streamlit。"""
+import functools
+import threading
+
+
+def resource(fn):
+    # 按参数记住返回值，首次创建时加锁；fn.clear() 清空
+    entries, lock = {}, threading.RLock()
+
+    @functools.wraps(fn)
+    def inner(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        try: return entries[key]
+        except KeyError: pass
+        with lock:
+            if key not in entries: entries[key] = fn(*args, **kwargs)
+            return entries[key]
+    inner.clear = entries.clear
+    return inner
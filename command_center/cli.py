@@ -0,0 +1,403 @@
+"""命令行批量导入 / 导出：流式分块读取 CSV / JSON / JSONL，逐块校验、补齐项目编号后批量写入；导出支持按条件筛选。
+
+    python -m command_center import tasks tasks.csv
+    python -m command_center import logs history.jsonl --chunk 5000 --rejects bad.jsonl
+    python -m command_center export tasks --category 学术 --status 进行中 --format jsonl -o tasks.jsonl
+    python -m command_center export logs --since 2026-01-01 --project 论文 -o logs.csv
+    python -m command_center export totals --until 2025-12-31 -o totals.csv
+    python -m command_center compact --hot-days 90
+    python -m command_center -w 学习 import tasks study.csv
+    python -m command_center workspaces
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from .core import (_ensure_events, add_tasks, compact_logs, generate_pid, get_data, get_id_allocator, get_notes, get_storage,
+                   get_subtask_store, log_totals, peek_pid, record_progress, save_log_entries, use_workspace, workspace_summaries)
+from .storage import (CATEGORY_LIST, CATEGORY_MAP, DEFAULT_WORKSPACE, LEGACY_SUBTASK_COL, LOG_COLS, LOG_HOT_DAYS, NEW_TASK_DEFAULTS,
+                      STATUS_LIST, TASK_COLS, TASK_DATE_COLS, TASK_INT_RANGES, check_workspace)
+
+FORMATS = ("csv", "json", "jsonl")
+CHUNK_ROWS = 2000   # 每块读入 / 校验 / 写入的行数，内存占用只和它有关
+SUBTASK_COL = "子任务"  # 导入导出时子任务以 JSON 数组放在这一列 (也接受旧的 任务分解JSON 列)
+_TRUE = {"1", "true", "yes", "y", "是", "√", "✓"}
+
+
+# --- 1. 流式读取 ---
+def _open(path, mode="r"):
+    # - 表示标准输入 / 输出，用完不关闭
+    if path == "-": return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    return open(path, mode, encoding="utf-8-sig" if mode == "r" else "utf-8", newline="")
+
+def _format(path, fmt):
+    if fmt: return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return ext if ext in FORMATS else "csv"
+
+_SKIP = re.compile(r"[\s,]*")
+
+def _json_items(f, block=1 << 16):
+    # 增量解析顶层 JSON 数组：每次只读入一块，解析出完整元素就产出
+    dec, buf, pos, eof = json.JSONDecoder(), "", 0, False
+    while not eof and not buf.strip():
+        data = f.read(block); eof, buf = not data, buf + data
+    buf = buf.lstrip()
+    if not buf: return
+    if buf[0] != "[": raise ValueError("JSON 输入必须是一个数组")
+    pos = 1
+    while True:
+        pos = _SKIP.match(buf, pos).end()
+        if buf.startswith("]", pos): return
+        try: obj, end = dec.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof: raise
+            data = f.read(block)
+            eof, buf, pos = not data, buf[pos:] + data, 0
+            continue
+        yield obj
+        pos = end
+
+def _records(f, fmt):
+    if fmt == "jsonl": return (json.loads(line) for line in f if line.strip())
+    return _json_items(f)
+
+def iter_chunks(path, fmt, size=CHUNK_ROWS):
+    # 按块产出 DataFrame；CSV 一律按字符串读入，类型转换统一交给校验
+    fmt = _format(path, fmt)
+    with _open(path) as f:
+        if fmt == "csv":
+            yield from pd.read_csv(f, dtype=str, keep_default_na=False, chunksize=size)
+            return
+        batch = []
+        for rec in _records(f, fmt):
+            if not isinstance(rec, dict): raise ValueError(f"每条记录必须是 JSON 对象: {rec!r}")
+            batch.append(rec)
+            if len(batch) >= size:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch: yield pd.DataFrame(batch)
+
+
+# --- 2. 校验与转换 ---
+def _text(chunk, col):
+    if col not in chunk.columns: return pd.Series("", index=chunk.index, dtype=object)
+    s = chunk[col]
+    return s.where(s.notna(), "").astype(str).str.strip()
+
+def _number(chunk, col, errors, lo, hi, default):
+    raw = _text(chunk, col)
+    num = pd.to_numeric(raw, errors="coerce")
+    _flag(errors, (raw != "") & num.isna(), f"{col} 不是数字")
+    return num.fillna(default).clip(lo, hi)
+
+def _date(chunk, col, errors, fallback=None):
+    raw = _text(chunk, col)
+    ts = pd.to_datetime(raw, errors="coerce", format="mixed")
+    _flag(errors, ((raw != "") | (fallback is None)) & ts.isna(), f"{col} 缺失或无法解析")
+    return ts.dt.date.where(ts.notna(), fallback)
+
+def _flag(errors, mask, reason):
+    # 每行只记第一条错误原因
+    errors[mask & (errors == "")] = reason
+
+def _subtasks(raw):
+    # 返回 (子任务列表, 错误原因)；编号一律丢弃，写入时按新的项目编号重新分配
+    if isinstance(raw, str):
+        if not raw.strip(): return [], ""
+        try: raw = json.loads(raw)
+        except ValueError: return [], "子任务不是合法 JSON"
+    if raw is None or (not isinstance(raw, list) and pd.isna(raw)): return [], ""
+    if not isinstance(raw, list): return [], "子任务必须是数组"
+    out = []
+    for s in raw:
+        if isinstance(s, str): s = {"name": s}
+        if not isinstance(s, dict) or not str(s.get("name") or "").strip(): return [], "子任务缺少名称"
+        w = s.get("weight")
+        num = pd.to_numeric(w, errors="coerce") if w not in (None, "") else 0
+        if pd.isna(num) or num < 0: return [], f"子任务权重无效: {w!r}"
+        done = s.get("done")
+        out.append({"name": str(s["name"]).strip(), "weight": int(round(num)),
+                    "done": done is True or str(done).strip().lower() in _TRUE})
+    return out, ""
+
+class PidAllocator:
+    # 导入时的项目编号：自带的编号查重；缺编号的从持久化序列领号，--dry-run 只预览不消耗序列
+    def __init__(self, tasks, dry_run=False):
+        self.dry_run, self.preview, self.taken = dry_run, {}, set(tasks["项目编号"].dropna().astype(str))
+
+    def claim(self, pid):
+        if pid in self.taken: return False
+        self.taken.add(pid)
+        return True
+
+    def new(self, category):
+        while True:
+            if self.dry_run:
+                if category not in self.preview: self.preview[category] = int(peek_pid(category).rsplit("-", 1)[1])
+                pid = f"{CATEGORY_MAP.get(category, 'PROJ')}-{self.preview[category]:02d}"
+                self.preview[category] += 1
+            else: pid = generate_pid(category)
+            if pid not in self.taken: break
+        self.taken.add(pid)
+        return pid
+
+def validate_tasks(chunk, pids, today):
+    # 返回 (合法任务 [(任务行, 子任务, 是否给出进度)], 拒绝 [(块内位置, 原因)])
+    errors = pd.Series("", index=chunk.index, dtype=object)
+    name = _text(chunk, "任务名称")
+    _flag(errors, name == "", "缺少任务名称")
+    cat = _text(chunk, "类别").replace("", NEW_TASK_DEFAULTS["类别"])
+    _flag(errors, ~cat.isin(CATEGORY_LIST), "未知类别")
+    status = _text(chunk, "状态").replace("", NEW_TASK_DEFAULTS["状态"])
+    _flag(errors, ~status.isin(STATUS_LIST), "未知状态")
+    out = pd.DataFrame({"任务名称": name, "类别": cat, "状态": status})
+    for col, (lo, hi) in TASK_INT_RANGES.items():
+        out[col] = _number(chunk, col, errors, lo, hi, NEW_TASK_DEFAULTS[col]).round().astype(int)
+    out["开始时间"] = _date(chunk, "开始时间", errors, today)
+    out["截止日期"] = _date(chunk, "截止日期", errors, today + timedelta(7))
+    _flag(errors, out["截止日期"] < out["开始时间"], "截止日期早于开始时间")
+    out["备注"], out["专属笔记"] = _text(chunk, "备注"), _text(chunk, "专属笔记")
+    has_prog = _text(chunk, "当前进度(%)") != ""
+    sub_col = SUBTASK_COL if SUBTASK_COL in chunk.columns else LEGACY_SUBTASK_COL
+    raw_subs = chunk[sub_col] if sub_col in chunk.columns else pd.Series(None, index=chunk.index, dtype=object)
+    given = _text(chunk, "项目编号")
+
+    rows, rejects = [], []
+    records = out[TASK_COLS[:-1]].to_dict(orient="records")
+    for pos, (row, raw, err, pid, prog) in enumerate(zip(records, raw_subs.tolist(), errors.tolist(), given.tolist(), has_prog.tolist())):
+        subs, why = _subtasks(raw)
+        why = err or why
+        if not why and pid and not pids.claim(pid): why = f"项目编号重复: {pid}"
+        if why:
+            rejects.append((pos, why))
+            continue
+        row["项目编号"] = pid or pids.new(row["类别"])
+        if subs and not prog:
+            total = sum(s["weight"] for s in subs)
+            row["当前进度(%)"] = min(int(sum(s["weight"] for s in subs if s["done"]) / total * 100), 100) if total else 0
+        rows.append((row, subs, prog))
+    return rows, rejects
+
+def validate_logs(chunk, tasks_by_name, store, strict=False):
+    # 返回 (合法日志 [(日期, 项目, 子任务, 内容, 贡献进度, 项目编号, 子任务ID)], 拒绝 [(块内位置, 原因)])
+    errors = pd.Series("", index=chunk.index, dtype=object)
+    day = _date(chunk, "日期", errors)
+    project = _text(chunk, "项目")
+    _flag(errors, project == "", "缺少项目")
+    if strict: _flag(errors, ~project.isin(list(tasks_by_name)), "找不到对应任务")
+    prog = _number(chunk, "贡献进度", errors, 0, 100, 0)
+    sub, content = _text(chunk, "子任务"), _text(chunk, "内容")
+
+    rows, rejects = [], []
+    for pos, (err, d, proj, sub_name, text, value) in enumerate(zip(errors.tolist(), day.tolist(), project.tolist(), sub.tolist(),
+                                                                     content.tolist(), prog.tolist())):
+        if err:
+            rejects.append((pos, err))
+            continue
+        pid = tasks_by_name.get(proj)
+        sub_id = next((s["id"] for s in store.for_task(pid) if s["name"] == sub_name), "") if pid and sub_name else ""
+        rows.append((d.isoformat(), proj, sub_name, text, int(value) if float(value).is_integer() else value, pid, sub_id))
+    return rows, rejects
+
+
+# --- 3. 导入 ---
+class _Progress:
+    # 统计行数与吞吐，按块向 stderr 汇报
+    def __init__(self, label, quiet=False):
+        self.label, self.quiet, self.start = label, quiet, time.perf_counter()
+        self.read = self.written = self.rejected = 0
+
+    def rate(self): return self.read / max(time.perf_counter() - self.start, 1e-9)
+
+    def tick(self, read, written, rejected):
+        self.read += read; self.written += written; self.rejected += rejected
+        if not self.quiet:
+            print(f"  {self.label}: 已读 {self.read} 行, 写入 {self.written}, 拒绝 {self.rejected}  ({self.rate():,.0f} 行/秒)", file=sys.stderr)
+
+    def summary(self):
+        secs = time.perf_counter() - self.start
+        return {"read": self.read, "written": self.written, "rejected": self.rejected, "seconds": round(secs, 3), "rows_per_sec": round(self.rate(), 1)}
+
+def _reject(out, offset, chunk, rejects):
+    for pos, why in rejects:
+        rec = {k: v for k, v in chunk.iloc[pos].items() if not (not isinstance(v, (list, dict)) and pd.isna(v))}
+        print(json.dumps({"行号": offset + pos + 1, "原因": why, "记录": rec}, ensure_ascii=False, default=str), file=out)
+
+def import_tasks(path, fmt=None, chunk_rows=CHUNK_ROWS, dry_run=False, rejects=sys.stderr, quiet=False):
+    _ensure_events()
+    pids, today, stats, offset = PidAllocator(get_data(), dry_run), date.today(), _Progress("任务", quiet), 0
+    for chunk in iter_chunks(path, fmt, chunk_rows):
+        # 一块里领到的编号合并成一次持久化，并且先于任务写入落盘
+        with get_id_allocator().batch(): rows, bad = validate_tasks(chunk, pids, today)
+        _reject(rejects, offset, chunk, bad)
+        if rows and not dry_run:
+            add_tasks([(row, subs) for row, subs, _ in rows])
+            # 导入的勾选状态和进度也要进事件流，进度引擎才能与任务表一致
+            store, day = get_subtask_store(), today.isoformat()
+            events = [(day, row["项目编号"], s["id"], "done", 1) for row, _, _ in rows for s in store.for_task(row["项目编号"]) if s["done"]]
+            events += [(day, row["项目编号"], "", "set", float(row["当前进度(%)"])) for row, _, given in rows if given]
+            record_progress(events)
+        offset += len(chunk)
+        stats.tick(len(chunk), 0 if dry_run else len(rows), len(bad))
+    return stats.summary()
+
+def import_logs(path, fmt=None, chunk_rows=CHUNK_ROWS, dry_run=False, strict=False, rejects=sys.stderr, quiet=False):
+    tasks = get_data()
+    tasks_by_name, store = dict(zip(tasks["任务名称"], tasks["项目编号"])), get_subtask_store()
+    stats, offset = _Progress("日志", quiet), 0
+    for chunk in iter_chunks(path, fmt, chunk_rows):
+        rows, bad = validate_logs(chunk, tasks_by_name, store, strict)
+        _reject(rejects, offset, chunk, bad)
+        if rows and not dry_run: save_log_entries(rows)
+        offset += len(chunk)
+        stats.tick(len(chunk), 0 if dry_run else len(rows), len(bad))
+    # 导入的历史日志大多早于热段分界线，导完一次性归档
+    if not dry_run: compact_logs()
+    return stats.summary()
+
+
+# --- 4. 导出 ---
+class _Writer:
+    def __init__(self, f, fmt, cols): self.f, self.fmt, self.cols, self.n = f, fmt, cols, 0
+
+    def write(self, df):
+        if df.empty: return
+        df = df[self.cols]
+        if self.fmt == "csv": df.to_csv(self.f, header=self.n == 0, index=False)
+        else:
+            recs = [json.dumps({k: (None if not isinstance(v, (list, dict)) and pd.isna(v) else v) for k, v in r.items()},
+                               ensure_ascii=False, default=str) for r in df.to_dict(orient="records")]
+            if self.fmt == "jsonl": self.f.write("".join(r + "\n" for r in recs))
+            else: self.f.write(("[\n" if self.n == 0 else ",\n") + ",\n".join(recs))
+        self.n += len(df)
+
+    def close(self):
+        if self.fmt == "csv" and self.n == 0: self.f.write(",".join(self.cols) + "\n")
+        if self.fmt == "json": self.f.write("[]\n" if self.n == 0 else "\n]\n")
+
+def _task_filter(tasks, categories=None, statuses=None, projects=None, since=None, until=None):
+    mask = pd.Series(True, index=tasks.index)
+    if categories: mask &= tasks["类别"].isin(categories)
+    if statuses: mask &= tasks["状态"].isin(statuses)
+    if projects: mask &= tasks["任务名称"].isin(projects) | tasks["项目编号"].isin(projects)
+    # 时间条件按任务区间 [开始时间, 截止日期] 与筛选区间有交集
+    if since: mask &= tasks["截止日期"] >= pd.Timestamp(since)
+    if until: mask &= tasks["开始时间"] <= pd.Timestamp(until)
+    return tasks[mask]
+
+def export_tasks(out, fmt="csv", chunk_rows=CHUNK_ROWS, **filters):
+    tasks, store, notes = _task_filter(get_data(), **filters), get_subtask_store(), get_notes()
+    writer = _Writer(out, fmt, TASK_COLS + [SUBTASK_COL])
+    for lo in range(0, len(tasks), chunk_rows):
+        part = tasks.iloc[lo:lo + chunk_rows]
+        part = part.assign(专属笔记=part["项目编号"].map(notes).fillna(""), **{col: part[col].dt.strftime("%Y-%m-%d") for col in TASK_DATE_COLS})
+        subs = [[{k: s[k] for k in ("name", "weight", "done")} for s in store.for_task(pid)] for pid in part["项目编号"]]
+        part = part.assign(**{SUBTASK_COL: subs if fmt != "csv" else [json.dumps(s, ensure_ascii=False) for s in subs]})
+        writer.write(part)
+    writer.close()
+    return writer.n
+
+def export_logs(out, fmt="csv", chunk_rows=CHUNK_ROWS, categories=None, statuses=None, projects=None, since=None, until=None):
+    # 日志按块从存储里读出、筛选后立即写出；类别 / 状态条件先换算成任务名称
+    names = None
+    if categories or statuses or projects:
+        names = set(_task_filter(get_data(), categories, statuses, projects)["任务名称"]) | set(projects or ())
+    writer = _Writer(out, fmt, LOG_COLS)
+    for chunk in get_storage().iter_logs(chunk_rows, since, until):
+        mask = pd.Series(True, index=chunk.index)
+        if names is not None: mask &= chunk["项目"].isin(names)
+        if since or until:
+            day = pd.to_datetime(chunk["日期"], errors="coerce").dt.date
+            if since: mask &= day.notna() & (day >= since)
+            if until: mask &= day.notna() & (day <= until)
+        writer.write(chunk[mask])
+    writer.close()
+    return writer.n
+
+TOTAL_COLS = ["项目", "子任务", "条数", "贡献进度"]
+
+def export_totals(out, fmt="csv", chunk_rows=CHUNK_ROWS, categories=None, statuses=None, projects=None, since=None, until=None):
+    # 按 (项目, 子任务) 汇总的日志条数和累计贡献，截至 until；已归档的月份直接用冷段的汇总行，不读历史日志
+    totals = log_totals(until)
+    if categories or statuses or projects:
+        totals = totals[totals["项目"].isin(set(_task_filter(get_data(), categories, statuses, projects)["任务名称"]) | set(projects or ()))]
+    writer = _Writer(out, fmt, TOTAL_COLS)
+    for lo in range(0, len(totals), chunk_rows): writer.write(totals.iloc[lo:lo + chunk_rows])
+    writer.close()
+    return writer.n
+
+
+# --- 5. 入口 ---
+def _day(s):
+    try: return date.fromisoformat(s)
+    except ValueError: raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {s}")
+
+def _workspace(s):
+    try: return check_workspace(s)
+    except ValueError as e: raise argparse.ArgumentTypeError(str(e))
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m command_center", description=__doc__.splitlines()[0])
+    p.add_argument("-w", "--workspace", type=_workspace, default=DEFAULT_WORKSPACE,
+                   help=f"在哪个工作区里操作 (缺省为{DEFAULT_WORKSPACE}工作区，即当前目录下的数据文件)")
+    sub = p.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="从 CSV / JSON / JSONL 批量导入")
+    imp.add_argument("kind", choices=["tasks", "logs"])
+    imp.add_argument("path", help="输入文件，- 表示标准输入")
+    imp.add_argument("--format", choices=FORMATS, help="默认按扩展名判断")
+    imp.add_argument("--chunk", type=int, default=CHUNK_ROWS, help=f"每块行数 (默认 {CHUNK_ROWS})")
+    imp.add_argument("--dry-run", action="store_true", help="只校验不写入")
+    imp.add_argument("--strict", action="store_true", help="拒绝找不到对应任务的日志")
+    imp.add_argument("--rejects", help="被拒绝的行写到这个 JSONL 文件 (默认打印到 stderr)")
+    imp.add_argument("-q", "--quiet", action="store_true", help="不打印逐块进度")
+    exp = sub.add_parser("export", help="按条件导出任务或日志")
+    exp.add_argument("kind", choices=["tasks", "logs", "totals"], help="totals: 按项目 / 子任务汇总的日志累计")
+    exp.add_argument("-o", "--output", default="-", help="输出文件，默认标准输出")
+    exp.add_argument("--format", choices=FORMATS)
+    exp.add_argument("--chunk", type=int, default=CHUNK_ROWS)
+    exp.add_argument("--category", nargs="*", choices=CATEGORY_LIST, dest="categories")
+    exp.add_argument("--status", nargs="*", choices=STATUS_LIST, dest="statuses")
+    exp.add_argument("--project", nargs="*", dest="projects", help="任务名称或项目编号")
+    exp.add_argument("--since", type=_day)
+    exp.add_argument("--until", type=_day)
+    cmp = sub.add_parser("compact", help="把热段里的旧日志按月归档成冷段")
+    cmp.add_argument("--hot-days", type=int, default=LOG_HOT_DAYS, help=f"最近多少天的日志留在热段 (默认 {LOG_HOT_DAYS}，按整月对齐)")
+    sub.add_parser("workspaces", help="列出所有工作区的汇总 (每行一个 JSON)")
+    args = p.parse_args(argv)
+    if args.command == "export" and args.kind == "totals" and args.since: p.error("totals 是截至 --until 的累计值，不支持 --since")
+    with use_workspace(args.workspace): return _run(args)
+
+def _run(args):
+    if args.command == "workspaces":
+        for row in workspace_summaries().to_dict(orient="records"): print(json.dumps(row, ensure_ascii=False, default=str))
+        return 0
+
+    if args.command == "compact":
+        print(json.dumps(compact_logs(args.hot_days), ensure_ascii=False))
+        return 0
+
+    if args.command == "import":
+        rejects = _open(args.rejects, "w") if args.rejects else sys.stderr
+        try:
+            if args.kind == "tasks": stats = import_tasks(args.path, args.format, args.chunk, args.dry_run, rejects, args.quiet)
+            else: stats = import_logs(args.path, args.format, args.chunk, args.dry_run, args.strict, rejects, args.quiet)
+        finally:
+            if rejects is not sys.stderr: rejects.close()
+        print(json.dumps(stats, ensure_ascii=False))
+        return 1 if stats["rejected"] else 0
+    fmt = _format(args.output, args.format) if args.output != "-" else (args.format or "csv")
+    filters = {k: getattr(args, k) for k in ("categories", "statuses", "projects", "since", "until")}
+    t = time.perf_counter()
+    with _open(args.output, "w") as out:
+        n = {"tasks": export_tasks, "logs": export_logs, "totals": export_totals}[args.kind](out, fmt, args.chunk, **filters)
+    secs = time.perf_counter() - t
+    print(f"导出 {n} 行, {secs:.2f} 秒 ({n / max(secs, 1e-9):,.0f} 行/秒)", file=sys.stderr)
+    return 0
@@ -0,0 +1,860 @@
+"""核心数据层：共享缓存、任务 / 子任务 / 日志读写、全局搜索索引、进度引擎与进度汇总。"""
+import bisect
+import contextvars
+import copy
+import json
+import re
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+from .caching import resource
+from .profiling import PROFILER, profiled
+from .storage import (CATEGORY_MAP, DEFAULT_WORKSPACE, EVENT_COLS, LOG_HOT_DAYS, LOG_SUMMARY_COLS, SNAPSHOT_EVERY,
+                      STATUS_LIST, STORAGE_ENGINE, TASK_COLS, WORKSPACE_SUMMARY_FILE, SubtaskStore, _atomic_write, _contrib, _iso_day,
+                      _log_day, _same, check_workspace, coerce_task_value, filter_logs, list_workspaces, log_summary, open_storage,
+                      parse_weight, workspace_path)
+
+# --- 工作区 ---
+# 当前工作区跟着执行上下文走 (每个界面会话的脚本线程、命令行、后台写入线程各自设置)，存储、缓存和搜索索引都按它分开
+_workspace = contextvars.ContextVar("workspace", default=DEFAULT_WORKSPACE)
+WORKSPACE_CACHE = 3  # 进程里最多同时留这么多个工作区的解析数据和搜索索引，更早用过的先丢
+
+def current_workspace(): return _workspace.get()
+
+@resource
+def _recent_workspaces(): return {"lock": threading.Lock(), "order": OrderedDict()}
+
+def _touch_workspace(name):
+    recent, evicted = _recent_workspaces(), []
+    with recent["lock"]:
+        recent["order"][name] = None
+        recent["order"].move_to_end(name)
+        while len(recent["order"]) > WORKSPACE_CACHE: evicted.append(recent["order"].popitem(last=False)[0])
+    for old in evicted: _drop_workspace_caches(old)
+
+def _drop_workspace_caches(name):
+    # 只丢解析好的数据和索引；存储连接、编号序列和写入队列都很小，留着
+    cache, state = _file_cache(name), _search_state(name)
+    with cache["lock"]: cache["entries"].clear()
+    with state["lock"]: state["index"], state["sig"] = None, None
+
+def set_workspace(name):
+    # 切换当前上下文的工作区 (界面每次运行开头调用)
+    _workspace.set(check_workspace(name))
+    _touch_workspace(name)
+
+@contextmanager
+def use_workspace(name, touch=True):
+    # 临时切到某个工作区；touch=False 时不算作"正在使用" (只读一下汇总时)
+    token = _workspace.set(check_workspace(name))
+    if touch: _touch_workspace(name)
+    try: yield name
+    finally: _workspace.reset(token)
+
+# --- 存储与缓存 ---
+@resource
+def _storage(engine, workspace): return open_storage(engine, workspace)
+
+def get_storage(engine=STORAGE_ENGINE): return _storage(engine, current_workspace())
+
+@resource
+def _file_cache(workspace):
+    # 每个工作区一份，跨 rerun / session 共享: (引擎, 数据种类) -> (版本签名, 解析好的 DataFrame)
+    return {"lock": threading.RLock(), "entries": {}}
+
+# 派生缓存 -> 它所依赖的存储数据
+_DERIVED_SIGS = {"progress": ("events", "subtasks"), "rollups": ("events", "subtasks"), "reports": ("logs",), "notes": ("tasks",),
+                 "logs_hot": ("logs",), "reports_hot": ("logs",), "summary": ("tasks", "logs", "events", "subtasks")}
+
+def _sig(kind): return tuple(get_storage().sig(k) for k in _DERIVED_SIGS.get(kind, (kind,)))
+
+def _load_cached(kind, parser):
+    cache, key = _file_cache(current_workspace()), (get_storage().name, kind)
+    sig = _sig(kind)
+    with cache["lock"]:
+        hit = cache["entries"].get(key)
+        if hit is not None and hit[0] == sig: return hit[1]
+    with PROFILER.span(f"解析 {kind}"): df = parser()
+    with cache["lock"]: cache["entries"][key] = (sig, df)
+    return df
+
+def _invalidate(kind):
+    cache = _file_cache(current_workspace())
+    with cache["lock"]: cache["entries"].pop((get_storage().name, kind), None)
+
+@contextmanager
+def _cache_guard(kind):
+    # 写入前缓存与存储一致时，就地增量更新缓存对象并推进签名；否则丢弃缓存
+    cache, key = _file_cache(current_workspace()), (get_storage().name, kind)
+    with cache["lock"]:
+        hit = cache["entries"].get(key)
+        live = hit is not None and hit[0] == _sig(kind)
+        yield hit[1] if live else None
+        if live: cache["entries"][key] = (_sig(kind), hit[1])
+        else: cache["entries"].pop(key, None)
+
+# 加锁顺序统一为: 存储写锁 -> 编号分配 -> 搜索索引 -> 数据缓存；读取不拿写锁
+@contextmanager
+def _write_guards(*kinds):
+    # 写锁在最外层：从检查缓存版本到写入完成之间不会有别的写入方 (其他会话或进程) 插进来，
+    # 返回写入后仍可增量维护的缓存对象
+    with ExitStack() as stack:
+        stack.enter_context(get_storage().write_lock)
+        live = {"index": stack.enter_context(_index_guard())}
+        for kind in kinds: live[kind] = stack.enter_context(_cache_guard(kind))
+        yield live
+
+def _load_tasks():
+    storage = get_storage()
+    version = storage.sig("tasks")
+    df = storage.load_tasks(lazy=True)
+    # 补丁以 项目编号 为键：旧数据里缺编号的行在首次加载时补齐并落盘。
+    # 按行位置写回编号 (不整表重写这份不带长文本列的帧)，这些行的笔记和子任务原样留着
+    missing = df["项目编号"].isna() | (df["项目编号"].astype(str).str.strip() == "")
+    if missing.any():
+        fill = {}
+        with get_id_allocator().batch():
+            for pos in [pos for pos, m in enumerate(missing) if m]:
+                df.iat[pos, df.columns.get_loc("项目编号")] = fill[pos] = generate_pid(df["类别"].iat[pos], df)
+        storage.fill_pids(fill)
+        version = storage.sig("tasks")
+    # 数据版本随帧 (及其过滤、复制出的帧) 带到界面，保存表格编辑时据此做乐观并发检查
+    df.attrs["version"] = version
+    return df
+
+def _hand_out(df):
+    # 缓存帧交给调用方：开了写时复制 (界面进程) 时只给浅副本，共享底层数组，谁改了才复制；
+    # 没开时 (命令行、脚本) 浅副本上的就地修改会改到缓存，只能整份复制
+    return df.copy(deep=not pd.get_option("mode.copy_on_write"))
+
+@profiled()
+def get_data(): return _hand_out(_load_cached("tasks", _load_tasks))
+
+@profiled()
+def get_notes():
+    # 项目编号 -> 专属笔记；笔记不在常驻的任务帧里，第一次用到时单独读这一列，随任务数据版本缓存
+    return _load_cached("notes", lambda: get_storage().load_task_column("专属笔记"))
+
+def get_note(pid): return str(get_notes().get(pid, ""))
+
+@profiled()
+def save_data(new_df):
+    get_id_allocator().observe("task", new_df["项目编号"])
+    get_storage().save_tasks(new_df)
+    _invalidate("tasks")
+
+def add_task(row, subs=()): add_tasks([(row, subs)])
+
+@profiled()
+def add_tasks(items):
+    # items: [(任务行, 子任务)]；一次存储写入，缓存和索引逐个增量维护
+    ids = get_id_allocator()
+    ids.observe("task", [row["项目编号"] for row, _ in items])
+    with ids.batch(): items = [(row, assign_subtask_ids(row["项目编号"], subs)) for row, subs in items]
+    with _write_guards("subtasks", "progress", "rollups") as live:
+        get_storage().insert_tasks(items)
+        for row, subs in items:
+            if live["subtasks"]: live["subtasks"].replace(row["项目编号"], subs)
+            if live["index"]: live["index"].upsert(row["项目编号"], {**_task_search_fields(row), "子任务": "\n".join(s["name"] for s in subs)})
+    _invalidate("tasks")
+
+@profiled()
+def get_subtask_store():
+    # 共享的只读对象，不要在面板里直接修改
+    return _load_cached("subtasks", lambda: SubtaskStore(get_storage().load_subtasks()))
+
+def normalize_subtasks(subs):
+    # 表格里编辑过的子任务整理成存储的形式 (权重取整、勾选转布尔、名称转字符串)；不碰编号，不领号
+    subs = [dict(s) for s in subs]
+    for s in subs:
+        s["weight"], s["done"] = parse_weight(s.get("weight")), bool(s.get("done")) if not pd.isna(s.get("done")) else False
+        s["name"] = "" if s.get("name") is None or pd.isna(s.get("name")) else str(s["name"])
+    return subs
+
+def assign_subtask_ids(pid, subs):
+    # 没有编号的子任务从该项目的子任务序列里领号；带编号的原样保留
+    subs = normalize_subtasks(subs)
+    fresh = [s for s in subs if not s.get("id") or pd.isna(s["id"])]
+    ids = get_id_allocator()
+    ids.observe("sub", [s["id"] for s in subs if s.get("id") and not pd.isna(s["id"])])
+    if fresh:
+        for s, num in zip(fresh, ids.take(f"sub:{pid}", lambda: _seed_sub(pid), len(fresh))): s["id"] = f"{pid}-{num:02d}"
+    return subs
+
+@profiled()
+def save_subtasks(pid, subs):
+    # 子任务的结构 (增删/改名/改权重) 与勾选状态一起保存：勾选变化记为 done 事件，
+    # 进度由进度引擎统一重算，只写这一个任务的子任务
+    subs = assign_subtask_ids(pid, subs)
+    old = {s["id"]: s["done"] for s in get_subtask_store().for_task(pid)}
+    today = date.today().isoformat()
+    events = [(today, pid, s["id"], "done", int(s["done"])) for s in subs if old.get(s["id"], False) != s["done"]]
+    record_progress(events, {pid: subs})
+
+@profiled()
+def update_task(pid, fields):
+    with _write_guards() as live:
+        get_storage().update_task(pid, fields)
+        if live["index"]: _index_update(live["index"], pid, fields)
+    _invalidate("tasks")
+
+@profiled()
+def editor_patch(source, state, defaults=None):
+    # 把 st.data_editor 的 edited/added/deleted 行转成以 项目编号 为键的最小补丁:
+    # updates = [(项目编号, 列, 旧值, 新值)]，只包含真正变化的单元格；base = source 读取时的数据版本
+    patch = {"updates": [], "added": [], "deleted": [], "base": source.attrs.get("version")}
+    if not state: return patch
+    for pos, changes in state.get("edited_rows", {}).items():
+        row = source.iloc[int(pos)]
+        for col, val in changes.items():
+            if col not in source.columns: continue
+            val = coerce_task_value(col, val)
+            if not _same(row[col], val): patch["updates"].append((row["项目编号"], col, row[col], val))
+    patch["deleted"] = [source.iloc[int(pos)]["项目编号"] for pos in state.get("deleted_rows", [])]
+    for added in state.get("added_rows", []):
+        if not any(v not in (None, "") for v in added.values()): continue
+        row = {**(defaults or {}), **{col: coerce_task_value(col, val) for col, val in added.items() if col in TASK_COLS}}
+        if not row.get("项目编号"): row["项目编号"] = generate_pid(row.get("类别"))
+        patch["added"].append(row)
+    return patch
+
+@profiled()
+def apply_patch(patch):
+    # 带 base 的补丁 (来自表格编辑) 做乐观并发检查：数据版本没变直接写；变了就逐行比对旧值，
+    # 只拒绝被别的会话改过的行，其余行照常合并。被拒绝的 项目编号 记在 patch["conflicts"]。
+    # 改名或新增后会撞号的行 (编号已存在或在补丁里重复) 也整行拒绝，撞上的编号记在 patch["duplicates"]
+    if not (patch["updates"] or patch["added"] or patch["deleted"]): return False
+    get_id_allocator().observe("task", [r["项目编号"] for r in patch["added"]] + [val for _, col, _, val in patch["updates"] if col == "项目编号"])
+    with _write_guards("subtasks", "progress", "rollups") as live:
+        storage = get_storage()
+        stale = "base" in patch and patch["base"] != storage.sig("tasks")
+        patch["conflicts"] = sorted(storage.conflicts(patch)) if stale and patch["updates"] else []
+        renamed = patch["added"] or any(col == "项目编号" for _, col, _, _ in patch["updates"])
+        patch["duplicates"] = sorted(storage.duplicates(patch)) if renamed else []
+        if patch["conflicts"] or patch["duplicates"]:
+            dup = set(patch["duplicates"])
+            bad = set(patch["conflicts"]) | {pid for pid, col, _, val in patch["updates"] if col == "项目编号" and str(val) in dup}
+            patch = {**patch, "updates": [u for u in patch["updates"] if u[0] not in bad],
+                     "added": [r for r in patch["added"] if str(r.get("项目编号", "")) not in dup]}
+        storage.apply_patch(patch)
+        if live["index"]: _index_patch(live["index"], patch)
+        if live["subtasks"]:
+            for pid in patch["deleted"]: live["subtasks"].remove_task(pid)
+            for pid, col, old, val in patch["updates"]:
+                if col == "项目编号": live["subtasks"].rename_task(pid, val)
+    _invalidate("tasks")
+    # 表格里直接改进度 = 手动设定，记为 set 事件，保持进度引擎与表格一致
+    today = date.today().isoformat()
+    record_progress([(today, pid, "", "set", _contrib(val)) for pid, col, old, val in patch["updates"] if col == "当前进度(%)"])
+    return True
+
+# --- 日志 ---
+LOG_SEGMENT_CACHE = 48  # 进程里最多留这么多个解析好的冷段 (及其报表索引)
+
+@resource
+def _segment_cache():
+    # 冷段文件写出后不再改动 (合并时换新文件名)，按路径缓存解析结果，LRU
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def _load_segment(storage, seg, kind="logs", build=None):
+    # kind / build: 在段数据上再构建的派生对象 (比如报表的日期索引)，和原始段数据分开缓存
+    cache, key = _segment_cache(), (seg["path"], kind)
+    with cache["lock"]:
+        if key in cache["entries"]:
+            cache["entries"].move_to_end(key)
+            return cache["entries"][key]
+    with PROFILER.span(f"解析 日志段 {seg['period']}"): obj = storage.load_log_segment(seg)
+    if build is not None: obj = build(obj)
+    with cache["lock"]:
+        cache["entries"][key] = obj
+        while len(cache["entries"]) > LOG_SEGMENT_CACHE: cache["entries"].popitem(last=False)
+    return obj
+
+def _hot_logs(): return _load_cached("logs_hot", get_storage().load_hot_logs)
+
+def _load_logs():
+    storage = get_storage()
+    segs, hot = storage.log_segments(), _hot_logs()
+    return pd.concat([*(storage.load_log_segment(seg) for seg in segs), hot], ignore_index=True) if segs else hot
+
+@profiled()
+def get_logs(since=None, until=None, project=None):
+    # 不带条件时是完整日志 (随版本缓存)；带日期区间 (含两端) 或项目名时只读相交的冷段和热段，
+    # 读取量随查询区间增长，与工作区用了多少年无关
+    if since is None and until is None and project is None: return _hand_out(_load_cached("logs", _load_logs))
+    storage = get_storage()
+    parts = [filter_logs(df, since, until, project) for df in [*(_load_segment(storage, seg) for seg in storage.log_segments(since, until, project)), _hot_logs()]]
+    parts = [df for df in parts if not df.empty] or parts[-1:]
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+@profiled()
+def log_totals(until=None):
+    # (项目, 子任务) -> 日志条数、累计贡献，截至 until (含当天，None 为全部)。
+    # 整段都在 until 之前的冷段直接用汇总行，只有跨过 until 的那一段才打开
+    storage, day = get_storage(), _iso_day(until)
+    segs, summary = storage.log_segments(until=until), storage.segment_summary()
+    whole = {seg["period"] for seg in segs if day is None or seg["end"] <= day}
+    parts = [summary.loc[summary["段"].isin(whole), LOG_SUMMARY_COLS]]
+    parts += [log_summary(filter_logs(_load_segment(storage, seg), until=until)) for seg in segs if seg["period"] not in whole]
+    parts.append(log_summary(filter_logs(_hot_logs(), until=until)))
+    parts = [df for df in parts if not df.empty] or [pd.DataFrame(columns=LOG_SUMMARY_COLS)]
+    return pd.concat(parts, ignore_index=True).groupby(["项目", "子任务"], dropna=False, as_index=False, sort=True)[["条数", "贡献进度"]].sum()
+
+@profiled()
+def compact_logs(hot_days=LOG_HOT_DAYS, today=None):
+    # 把热段里的旧日志按月归档成冷段；日志内容不变，完整日志缓存、报表和搜索索引都原样保留
+    with _write_guards("logs", "reports"): stats = get_storage().compact_logs(hot_days, today)
+    _invalidate("logs_hot")
+    return stats
+
+def save_log_entry(date_str, project, subtask, content, prog_incr, pid=None, sub_id=None):
+    save_log_entries([(date_str, project, subtask, content, prog_incr, pid, sub_id)])
+
+@profiled()
+def save_log_entries(entries):
+    # entries: [(日期, 项目, 子任务, 内容, 贡献进度, 项目编号, 子任务ID)]；项目编号为 None 的日志不计入进度
+    _ensure_events()
+    with _write_guards() as live:
+        get_storage().append_logs([e[:5] for e in entries])
+        if live["index"]:
+            for e in entries: live["index"].add_log(e[1], e[3])
+    _invalidate("logs")
+    record_progress([(e[0], e[5], e[6] or "", "log", _contrib(e[4])) for e in entries if e[5] is not None])
+    # 热段里最早的日志过了分界线 (大约每月一次) 就顺手归档
+    if get_storage().log_compaction_due(): compact_logs()
+
+# --- 编号分配 ---
+# 每个序列 (任务编号按类别前缀，子任务编号按所属项目编号) 持久化记下一个可用号。某个序列第一次用到时才扫描一次
+# 现有数据做种子，之后分配只是持锁递增再追加一条记录，成本与任务数无关；删掉的编号不会再发出，旧事件不会挂到新任务上
+_SEQ_ID = re.compile(r"^(.*)-(\d+)$")
+
+class IdAllocator:
+    # 内存里的序列只是缓存：每次领号都在存储写锁里先合并磁盘上 (其他进程写入) 的序列，再写回
+    def __init__(self, storage):
+        self.storage, self.lock, self.local = storage, threading.RLock(), threading.local()
+        self.sig, self.next = storage.sig("sequences"), storage.load_sequences()
+
+    def _refresh(self):
+        sig = self.storage.sig("sequences")
+        if sig != self.sig: self._merge(sig, self.storage.load_sequences())
+
+    def _merge(self, sig, seqs):
+        for key, val in seqs.items(): self.next[key] = max(val, self.next.get(key, 0))
+        self.sig = sig
+
+    def _save(self, seqs):
+        self.storage.save_sequences(seqs)
+        self.sig = self.storage.sig("sequences")
+
+    def _ensure(self, key, seed):
+        if key not in self.next: self.next[key] = seed()
+        return self.next[key]
+
+    def peek(self, key, seed):
+        # 只是预览，不拿写锁。读序列 (攒多了会顺手压缩文件，要拿写锁) 和扫描种子 (可能补齐编号、领号) 都在 self.lock 之外，
+        # 不和先拿写锁再拿 self.lock 的领号路径反着加锁
+        sig = self.storage.sig("sequences")
+        seqs = self.storage.load_sequences() if sig != self.sig else None
+        with self.lock:
+            if seqs is not None: self._merge(sig, seqs)
+            if key in self.next: return self.next[key]
+        start = seed()
+        with self.lock: return self.next.setdefault(key, start)
+
+    def take(self, key, seed, n=1):
+        with self.storage.write_lock, self.lock:
+            self._refresh()
+            start = self._ensure(key, seed)
+            self.next[key] = start + n
+            pending = getattr(self.local, "pending", None)
+            if pending is not None: pending[key] = start + n
+            else: self._save({key: start + n})
+        return list(range(start, start + n))
+
+    @contextmanager
+    def batch(self):
+        # 当前线程内的多次分配合并成一次持久化；要在用到这些编号的数据落盘之前退出。
+        # 整个批次持有存储写锁，其他进程不会在批次中途领到同样的号
+        if getattr(self.local, "pending", None) is not None:
+            yield
+            return
+        with self.storage.write_lock:
+            self.local.pending = {}
+            try: yield
+            finally:
+                pending, self.local.pending = self.local.pending, None
+                if pending:
+                    with self.lock: self._save(pending)
+
+    def observe(self, kind, ids):
+        # 外部写入的编号 (导入、表格里手填或改名)：已建立的序列推进到它之后；未建立的序列以后做种子时自然会扫到
+        moved = {}
+        with self.storage.write_lock, self.lock:
+            self._refresh()
+            for i in ids:
+                m = _SEQ_ID.match(str(i))
+                key = m and f"{kind}:{m.group(1)}"
+                if key in self.next and int(m.group(2)) >= self.next[key]: self.next[key] = moved[key] = int(m.group(2)) + 1
+            if moved: self._save(moved)
+
+@resource
+def _id_allocator(engine, workspace): return IdAllocator(_storage(engine, workspace))
+
+def get_id_allocator(engine=STORAGE_ENGINE): return _id_allocator(engine, current_workspace())
+
+def _seed_pid(prefix, tasks=None):
+    # 旧的扫描规则：该前缀下已有编号中第一段数字的最大值 + 1；只留在事件流里的已删除任务也算在内
+    tasks = get_data() if tasks is None else tasks
+    ids = pd.concat([tasks["项目编号"].astype(object), get_storage().load_events()["项目编号"].astype(object)]).dropna().astype(str)
+    nums = ids[ids.str.startswith(prefix)].str.extract(r'(\d+)')[0].astype(float)
+    return int(nums.max()) + 1 if nums.notna().any() else 1
+
+def _seed_sub(pid):
+    used = [s["id"] for s in get_subtask_store().for_task(pid)]
+    entry = get_progress_engine().state.get(pid)
+    if entry: used += [*entry["log"], *entry["done"]]
+    nums = [int(m.group(2)) for m in map(_SEQ_ID.match, map(str, used)) if m and m.group(1) == pid]
+    return max(nums, default=0) + 1
+
+def peek_pid(category):
+    # 预览下一个项目编号，不消耗序列
+    prefix = CATEGORY_MAP.get(category, "PROJ")
+    return f"{prefix}-{get_id_allocator().peek(f'task:{prefix}', lambda: _seed_pid(prefix)):02d}"
+
+@profiled()
+def generate_pid(category, tasks=None):
+    # tasks: 只在该类别第一次分配时用来扫描种子 (默认取当前任务表)
+    prefix = CATEGORY_MAP.get(category, "PROJ")
+    num, = get_id_allocator().take(f"task:{prefix}", lambda: _seed_pid(prefix, tasks))
+    return f"{prefix}-{num:02d}"
+
+# --- 全局搜索索引 ---
+# 字符 n-gram 倒排索引：中文无需分词；按字段权重排序并返回命中字段
+SEARCH_FIELDS = {"项目编号": 5, "任务名称": 4, "类别": 3, "子任务": 2, "笔记": 1, "日志": 1}
+SEARCH_OPTIONAL_FIELDS = ("笔记", "日志")
+
+def _ngrams(text, n=2):
+    if len(text) < n: return {text} if text else set()
+    return {text[i:i+n] for i in range(len(text) - n + 1)}
+
+# 任务列 -> 搜索字段
+_SEARCH_COLS = {"项目编号": "项目编号", "任务名称": "任务名称", "类别": "类别", "专属笔记": "笔记"}
+
+def _search_text(col, val):
+    return "" if val is None or (not isinstance(val, str) and pd.isna(val)) else str(val)
+
+def _task_search_fields(row):
+    return {field: _search_text(col, row[col]) for col, field in _SEARCH_COLS.items() if col in row}
+
+class SearchIndex:
+    def __init__(self):
+        self.docs = {}      # 项目编号 -> {字段: 小写文本}
+        self.logs = {}      # 项目编号 -> [小写日志内容]；每条日志单独切一次 n-gram，不再拼成一段整体重切
+        self.postings = {}  # n-gram -> {(项目编号, 字段)}
+        self.names = {}     # 任务名称 -> 项目编号 (日志按任务名称挂到任务上)
+        self.deep = False   # 笔记和日志 (可选字段) 是否已载入
+
+    def _set_field(self, pid, field, text):
+        doc = self.docs.setdefault(pid, {})
+        old = doc.get(field, "")
+        text = text.lower()
+        if old == text: return
+        key = (pid, field)
+        for g in _ngrams(old) | set(old): self.postings.get(g, set()).discard(key)
+        for g in _ngrams(text) | set(text): self.postings.setdefault(g, set()).add(key)
+        doc[field] = text
+
+    def upsert(self, pid, fields):
+        if "任务名称" in fields: self.names[fields["任务名称"]] = pid
+        for field, text in fields.items(): self._set_field(pid, field, text)
+
+    def remove(self, pid):
+        for field in list(self.docs.get(pid, {})): self._set_field(pid, field, "")
+        self.docs.pop(pid, None)
+        for g in set().union(*(_ngrams(t) | set(t) for t in self.logs.pop(pid, []))): self.postings.get(g, set()).discard((pid, "日志"))
+
+    def rename(self, pid, new_pid):
+        texts, logs = dict(self.docs.get(pid, {})), self.logs.get(pid, [])
+        self.remove(pid)
+        texts["项目编号"] = str(new_pid)
+        self.upsert(new_pid, texts)
+        for text in logs: self._add_log(new_pid, text)
+        for name, p in list(self.names.items()):
+            if p == pid: self.names[name] = new_pid
+
+    def _add_log(self, pid, text):
+        self.logs.setdefault(pid, []).append(text)
+        for g in _ngrams(text) | set(text): self.postings.setdefault(g, set()).add((pid, "日志"))
+
+    def add_log(self, project, content):
+        # 还没载入日志的索引不收零散的新日志，等深度搜索时整体载入
+        pid = self.names.get(project)
+        if not self.deep or pid is None or not isinstance(content, str) or not content: return
+        self._add_log(pid, content.lower())
+
+    def add_optional(self, notes, logs):
+        # 第一次深度搜索时补上笔记和日志；logs 是 (项目, 内容) 序列
+        for pid in list(self.docs): self._set_field(pid, "笔记", str(notes.get(pid, "")))
+        self.deep = True
+        for project, content in logs: self.add_log(project, content)
+
+    def query(self, q, fields=None):
+        q = q.strip().lower()
+        if not q: return []
+        grams = _ngrams(q) if len(q) > 1 else {q}
+        cands = None
+        for g in sorted(grams, key=lambda g: len(self.postings.get(g, ()))):
+            cands = set(self.postings.get(g, ())) if cands is None else cands & self.postings.get(g, set())
+            if not cands: return []
+        best = {}
+        for pid, field in cands:
+            if fields is not None and field not in fields: continue
+            texts = [t for t in (self.logs.get(pid, []) if field == "日志" else [self.docs[pid][field]]) if q in t]
+            if not texts: continue
+            score = SEARCH_FIELDS[field] * 10 + (5 if q in texts else 2 if any(t.startswith(q) for t in texts) else 0)
+            if score > best.get(pid, (None, -1))[1]: best[pid] = (field, score)
+        return sorted(((pid, f, sc) for pid, (f, sc) in best.items()), key=lambda h: -h[2])
+
+def _build_index(tasks, subs, notes=None, logs=None):
+    idx = SearchIndex()
+    for row in tasks.to_dict(orient="records"):
+        pid = row["项目编号"]
+        idx.upsert(pid, {**_task_search_fields(row), "子任务": "\n".join(subs.names(pid))})
+    if notes is not None: idx.add_optional(notes, logs)
+    return idx
+
+@resource
+def _search_state(workspace):
+    # 每个工作区一份的索引 + 其对应的数据版本；写入时增量更新，外部改动时整体重建
+    return {"lock": threading.RLock(), "index": None, "sig": None}
+
+def _data_sigs():
+    storage = get_storage()
+    return (storage.name, storage.sig("tasks"), storage.sig("logs"), storage.sig("subtasks"))
+
+@profiled()
+def get_search_index(deep=False):
+    # deep: 同时要笔记和日志。普通搜索只建任务和子任务字段，不读日志和笔记；第一次深度搜索时再补进同一个索引
+    state = _search_state(current_workspace())
+    with state["lock"]:
+        live = state["index"] is not None and state["sig"] == _data_sigs()
+        if live and (state["index"].deep or not deep): return state["index"]
+    # 先在锁外读好数据 (读取可能触发补齐编号等写入，不能在持有索引锁时去等写锁)
+    sig = _data_sigs()
+    tasks, subs = get_data(), get_subtask_store()
+    notes, logs = (get_notes(), _search_logs()) if deep else (None, None)
+    with state["lock"]:
+        live = state["index"] is not None and state["sig"] == _data_sigs()
+        if live and (state["index"].deep or not deep): return state["index"]
+        if live and state["sig"] == sig: state["index"].add_optional(notes, logs)
+        else: state["index"], state["sig"] = _build_index(tasks, subs, notes, logs), sig
+        return state["index"]
+
+def _search_logs():
+    # 深度搜索要的 (项目, 内容)：冷段逐段直接读、只取这两列，不进完整日志缓存和冷段缓存
+    storage, out = get_storage(), []
+    for seg in storage.log_segments():
+        df = storage.load_log_segment(seg)
+        out += zip(df["项目"], df["内容"])
+    hot = _hot_logs()
+    return out + list(zip(hot["项目"], hot["内容"]))
+
+@contextmanager
+def _index_guard():
+    # 只有写入前索引与数据一致时才做增量维护，否则留给下次读取时重建
+    state = _search_state(current_workspace())
+    with state["lock"]:
+        live = state["index"] is not None and state["sig"] == _data_sigs()
+        yield state["index"] if live else None
+        if live: state["sig"] = _data_sigs()
+
+def _index_update(idx, pid, fields):
+    idx.upsert(pid, _task_search_fields(fields))
+    if "项目编号" in fields and fields["项目编号"] != pid: idx.rename(pid, fields["项目编号"])
+
+def _index_patch(idx, patch):
+    for pid in patch["deleted"]: idx.remove(pid)
+    for pid, col, old, val in patch["updates"]:
+        if col != "项目编号": _index_update(idx, pid, {col: val})
+    for pid, col, old, val in patch["updates"]:
+        if col == "项目编号": idx.rename(pid, val)
+    for row in patch["added"]: idx.upsert(row["项目编号"], _task_search_fields(row))
+
+@profiled()
+def search_tasks(query, include_optional=False):
+    fields = None if include_optional else [f for f in SEARCH_FIELDS if f not in SEARCH_OPTIONAL_FIELDS]
+    return get_search_index(include_optional).query(query, fields)
+
+# --- 进度引擎 ---
+# 日志贡献、子任务勾选、手动改进度都是只追加的事件；任务进度 = 从最近一次快照开始重放事件，
+# 按日期回看某个任务时只重放该任务自己的事件。
+# 子任务的日志贡献以其权重封顶、勾选完成即记满权重，两条更新路径不会再重复累加。
+
+def _new_entry(): return {"base": 0.0, "log": {}, "done": {}}
+
+def _computed(entry, subs):
+    if not subs: return sum(entry["log"].values())
+    total_w = sum(s["weight"] for s in subs)
+    if total_w <= 0: return 0.0
+    got = sum(s["weight"] if entry["done"].get(s["id"]) else min(s["weight"], entry["log"].get(s["id"], 0.0)) for s in subs)
+    return got / total_w * 100
+
+def _entry_progress(entry, subs):
+    return int(round(min(max(entry["base"] + _computed(entry, subs), 0), 100)))
+
+def _apply_event(entry, sub_id, kind, value, subs):
+    # set (手动设定的目标进度) 只在预览和旧的事件流里出现：它的偏移取决于重放时的子任务权重。
+    # 写入时一律换算成 base，记下当时的偏移，之后改权重、重建引擎都按同一个偏移重放
+    if kind == "log": entry["log"][sub_id] = entry["log"].get(sub_id, 0.0) + float(value)
+    elif kind == "done": entry["done"][sub_id] = bool(value)
+    elif kind == "base": entry["base"] = float(value)
+    elif kind == "set": entry["base"] = float(value) - _computed(entry, subs)
+
+class ProgressEngine:
+    def __init__(self, events, snapshot, store, history=None):
+        # snapshot: 最新一份快照 (或 None)；events: 快照之后的事件 (没有快照时就是全部)。
+        # history: 读完整事件流的函数，只有按日期回看和重放燃起图时才调用，冷启动不读快照之前的事件
+        self.appended, self.appended_by_task, self.positions = [], {}, None
+        snap = snapshot or {"seq": 0, "state": {}}
+        self.seq, self.state = snap["seq"], snap["state"]
+        tail = events.iloc[int(events["序号"].searchsorted(self.seq, side="right")):]
+        for seq, day, pid, sub_id, kind, value in tail[EVENT_COLS].itertuples(index=False):
+            _apply_event(self.state.setdefault(pid, _new_entry()), sub_id, kind, value, store.for_task(pid))
+            self.seq = max(self.seq, int(seq))
+        self.since_snapshot, self.built_seq = len(tail), self.seq
+        self.load_history, self.events = history, events if snapshot is None or history is None else None
+
+    def history(self):
+        # 引擎建好时为止的完整事件流 (之后记录的在 appended 里)；第一次用到时才读
+        if self.events is None:
+            events = self.load_history()
+            self.events = events[events["序号"] <= self.built_seq].reset_index(drop=True)
+        return self.events
+
+    def progress(self, pid, store): return _entry_progress(self.state.get(pid, _new_entry()), store.for_task(pid))
+
+    def record(self, storage, events, store):
+        # events: [(日期, 项目编号, 子任务ID, 事件, 数值)]；返回每条事件带来的 (项目编号, 日, 进度变化)
+        rows, deltas = [], []
+        for day, pid, sub_id, kind, value in events:
+            self.seq += 1
+            entry, subs = self.state.setdefault(pid, _new_entry()), store.for_task(pid)
+            if kind == "set": kind, value = "base", float(value) - _computed(entry, subs)
+            rows.append((self.seq, day, pid, sub_id, kind, value))
+            before = _entry_progress(entry, subs)
+            _apply_event(entry, sub_id, kind, value, subs)
+            deltas.append((pid, _log_day(day), _entry_progress(entry, subs) - before))
+        storage.append_events(rows)
+        self.appended.extend(rows)
+        for row in rows: self.appended_by_task.setdefault(row[2], []).append(row)
+        self.since_snapshot += len(rows)
+        if self.since_snapshot >= SNAPSHOT_EVERY: self.snapshot(storage)
+        return deltas
+
+    def snapshot(self, storage):
+        # 存储当场序列化当前状态，只追加这一份
+        storage.save_snapshot({"seq": self.seq, "state": self.state})
+        self.since_snapshot = 0
+
+    def _task_events(self, pid):
+        # 按任务分组的事件下标第一次按日期回看时建一次；之后追加的事件另按任务记
+        if self.positions is None: self.positions = self.history().groupby("项目编号", sort=False).indices
+        pos = self.positions.get(pid)
+        rows = [] if pos is None else self.history().iloc[pos][EVENT_COLS].itertuples(index=False)
+        return [*rows, *self.appended_by_task.get(pid, [])]
+
+    def progress_as_of(self, pid, day, store):
+        # 按序号重放该任务日期 <= day 的事件；与事件流总长无关
+        day = day.isoformat() if isinstance(day, date) else str(day)
+        entry, subs = _new_entry(), store.for_task(pid)
+        for seq, ev_day, ev_pid, sub_id, kind, value in self._task_events(pid):
+            if ev_day <= day: _apply_event(entry, sub_id, kind, value, subs)
+        return _entry_progress(entry, subs)
+
+    def daily_deltas(self, store):
+        # 按日期完整重放一遍，得到每个 (项目编号, 日) 的进度变化；用于重建燃起图汇总
+        rows = sorted([*self.history()[EVENT_COLS].itertuples(index=False), *self.appended], key=lambda r: (r[1], r[0]))
+        state, out = {}, {}
+        for seq, day, pid, sub_id, kind, value in rows:
+            entry, subs = state.setdefault(pid, _new_entry()), store.for_task(pid)
+            before = _entry_progress(entry, subs)
+            _apply_event(entry, sub_id, kind, value, subs)
+            key = (pid, _log_day(day))
+            out[key] = out.get(key, 0) + _entry_progress(entry, subs) - before
+        df = pd.DataFrame([(pid, d, v) for (pid, d), v in out.items() if d is not None], columns=["项目编号", "日期", "贡献进度"])
+        return df
+
+def _seed_events(storage):
+    # 升级旧数据：没有事件流时，用已有日志 + 已勾选子任务生成初始事件，
+    # 再用 set 事件 (写入时换算成 base) 把每个任务对齐到当前保存的进度，升级前后数值不跳变
+    tasks, store, logs = get_data(), get_subtask_store(), get_logs()
+    today = date.today().isoformat()
+    pids = dict(zip(tasks["任务名称"], tasks["项目编号"]))
+    events = []
+    for day, project, sub_name, value in logs[["日期", "项目", "子任务", "贡献进度"]].itertuples(index=False):
+        if project not in pids or _log_day(day) is None: continue
+        sub_id = next((s["id"] for s in store.for_task(pids[project]) if s["name"] == sub_name), "")
+        events.append((_log_day(day).isoformat(), pids[project], sub_id, "log", _contrib(value)))
+    for pid in tasks["项目编号"]:
+        events += [(today, pid, s["id"], "done", 1) for s in store.for_task(pid) if s["done"]]
+    engine = ProgressEngine(pd.DataFrame(columns=EVENT_COLS), None, store)
+    if events: engine.record(storage, events, store)
+    aligned = [(today, pid, "", "set", _contrib(stored)) for pid, stored in zip(tasks["项目编号"], tasks["当前进度(%)"])
+               if _contrib(stored) != engine.progress(pid, store)]
+    if aligned: engine.record(storage, aligned, store)
+
+def _ensure_events():
+    # 补种放在缓存加载之外：否则缓存记下的是补种前的事件版本，下一次读取又会整体重建
+    cache, key = _file_cache(current_workspace()), (get_storage().name, "seeded")
+    if key in cache["entries"]: return
+    with get_storage().write_lock, cache["lock"]:
+        if key in cache["entries"]: return
+        if get_storage().load_events().empty: _seed_events(get_storage())
+        cache["entries"][key] = (None, True)
+
+def _build_engine():
+    _ensure_events()
+    storage = get_storage()
+    snap = storage.load_snapshot()
+    return ProgressEngine(storage.load_events(snap), snap, get_subtask_store(), storage.load_events)
+
+@profiled()
+def get_progress_engine():
+    # 共享的只读对象，写入统一走 record_progress
+    _ensure_events()
+    return _load_cached("progress", _build_engine)
+
+# 单次写入的事件超过这么多时不再逐条更新燃起图汇总 (每条都要平移其后的累计值)，直接丢弃留给下次读取时重放
+ROLLUP_BATCH_MAX = 2000
+
+@profiled()
+def record_progress(events, subtasks=None):
+    # 唯一的进度写入口：追加事件 (以及同时发生的子任务结构变化)，再把引擎算出的进度写回任务表
+    if not events and not subtasks: return
+    bulk = len(events) > ROLLUP_BATCH_MAX
+    get_progress_engine()
+    if not bulk: get_rollups()
+    pids = {e[1] for e in events} | set(subtasks or {})
+    with _write_guards("subtasks", "progress", "rollups") as live:
+        engine, store, storage = live["progress"] or _build_engine(), live["subtasks"], get_storage()
+        view = store or get_subtask_store()
+        before = {pid: engine.progress(pid, view) for pid in pids}
+        for pid, subs in (subtasks or {}).items():
+            storage.replace_subtasks(pid, subs)
+            if store: store.replace(pid, subs)
+            if live["index"]: live["index"].upsert(pid, {"子任务": "\n".join(s["name"] for s in subs)})
+        view = store or SubtaskStore(storage.load_subtasks())
+        deltas = engine.record(storage, events, view) if events else []
+        if live["rollups"] and not bulk:
+            today = date.today()
+            for pid in subtasks or {}:
+                # 权重结构变化带来的进度差额计入今天
+                moved = engine.progress(pid, view) - before[pid] - sum(d for p, _, d in deltas if p == pid)
+                if moved: live["rollups"].add(pid, today, moved)
+            for pid, day, delta in deltas:
+                if delta and day is not None: live["rollups"].add(pid, day, delta)
+        after = {pid: engine.progress(pid, view) for pid in pids}
+    if bulk: _invalidate("rollups")
+    tasks = get_data().set_index("项目编号")["当前进度(%)"]
+    changed = [(pid, "当前进度(%)", tasks.get(pid), prog) for pid, prog in after.items()
+               if pid in tasks.index and _contrib(tasks.get(pid)) != prog]
+    if changed:
+        # 一次补丁写回所有变化的任务 (引擎算出的进度为准，不做并发检查)；进度不在搜索字段里，索引只需推进版本
+        with _write_guards(): get_storage().apply_patch({"updates": changed, "added": [], "deleted": []})
+        _invalidate("tasks")
+
+def task_progress(pid): return get_progress_engine().progress(pid, get_subtask_store())
+
+def progress_as_of(pid, day): return get_progress_engine().progress_as_of(pid, day, get_subtask_store())
+
+def preview_progress(pid, events, subs):
+    # 还没写入的事件和子任务结构下的进度预览，不改动共享的引擎状态
+    entry = copy.deepcopy(get_progress_engine().state.get(pid, _new_entry()))
+    for day, _, sub_id, kind, value in events: _apply_event(entry, sub_id, kind, value, subs)
+    return _entry_progress(entry, subs)
+
+# --- 进度汇总 ---
+ALL_PROJECTS = "📦 全部项目"
+
+class ProgressRollup:
+    # (项目编号, 日) -> 当日进度变化 / 累计进度，按日期有序；记录进度事件时增量更新，也可随时由进度引擎重放重建
+    def __init__(self, df=None):
+        self.days, self.contrib, self.cum = {}, {}, {}
+        if df is None or df.empty: return
+        for key, g in [*df.groupby("项目编号", sort=False), (ALL_PROJECTS, df.groupby("日期", as_index=False)["贡献进度"].sum())]:
+            g = g.sort_values("日期")
+            self.days[key], self.contrib[key] = list(g["日期"]), [float(c) for c in g["贡献进度"]]
+            self.cum[key] = [float(c) for c in g["贡献进度"].cumsum()]
+
+    def _add(self, key, day, amount):
+        days, contrib, cum = self.days.setdefault(key, []), self.contrib.setdefault(key, []), self.cum.setdefault(key, [])
+        i = bisect.bisect_left(days, day)
+        if i == len(days) or days[i] != day:
+            days.insert(i, day); contrib.insert(i, 0.0); cum.insert(i, cum[i-1] if i else 0.0)
+        contrib[i] += amount
+        for j in range(i, len(days)): cum[j] += amount
+
+    def add(self, pid, day, amount):
+        self._add(pid, day, amount)
+        self._add(ALL_PROJECTS, day, amount)
+
+    def series(self, pid, start=None, end=None):
+        # 只切出 [start, end] 区间内的天数；累计值已包含区间之前的贡献
+        days = self.days.get(pid, [])
+        lo = bisect.bisect_left(days, start) if start else 0
+        hi = bisect.bisect_right(days, end) if end else len(days)
+        return pd.DataFrame({"日期": days[lo:hi], "贡献进度": self.contrib[pid][lo:hi] if days else [],
+                             "累计进度": self.cum[pid][lo:hi] if days else []})
+
+@profiled()
+def get_rollups():
+    # 共享的只读对象，不要在面板里直接修改
+    _ensure_events()
+    return _load_cached("rollups", lambda: ProgressRollup(get_progress_engine().daily_deltas(get_subtask_store())))
+
+# --- 跨工作区概览 ---
+ALL_WORKSPACES = "📦 全部工作区"
+WORKSPACE_SUMMARY_COLS = ["工作区", "任务数", *STATUS_LIST, "平均进度", "日志数", "本周进度"]
+
+def _build_summary():
+    # 当前工作区的汇总行：状态计数和平均进度取自任务帧，日志条数取自日志汇总，本周进度取自燃起图汇总
+    tasks, today = get_data(), date.today()
+    status, prog = tasks["状态"].astype(str).value_counts(), pd.to_numeric(tasks["当前进度(%)"], errors='coerce')
+    week = get_rollups().series(ALL_PROJECTS, today - timedelta(days=today.weekday()), today)
+    return {"任务数": len(tasks), **{s: int(status.get(s, 0)) for s in STATUS_LIST}, "平均进度": round(float(prog.mean()), 1) if prog.notna().any() else 0.0,
+            "日志数": int(log_totals()["条数"].sum()), "本周进度": float(week["贡献进度"].sum())}
+
+def _summary_stamp(): return repr((_sig("summary"), date.today().isoformat()))
+
+@profiled()
+def workspace_summary(name=None):
+    # 某个工作区的汇总行。它目录里存着上次算好的汇总，数据版本和日期都对得上就直接用 (只 stat 几个文件)；
+    # 过期时才在该工作区里重算，原本不在缓存里的工作区算完就丢掉解析结果，不占常驻内存
+    name = current_workspace() if name is None else name
+    with use_workspace(name, touch=False):
+        path, stamp = workspace_path(name, WORKSPACE_SUMMARY_FILE), _summary_stamp()
+        try:
+            with open(path, encoding="utf-8") as f: saved = json.load(f)
+            if saved.get("stamp") == stamp: return saved["summary"]
+        except (OSError, ValueError): pass
+        recent = _recent_workspaces()
+        with recent["lock"]: loaded = name in recent["order"]
+        summary = _build_summary()
+        # 重算期间数据又变了 (或重算本身补齐了编号 / 进度事件) 就不落盘，下次再算
+        if _summary_stamp() == stamp: _atomic_write(path, lambda f: json.dump({"stamp": stamp, "summary": summary}, f, ensure_ascii=False))
+        if not loaded: _drop_workspace_caches(name)
+    return summary
+
+@profiled()
+def workspace_summaries(names=None):
+    # 跨工作区概览：每个工作区一行 (由各自的汇总行拼成，不把各工作区的数据一起载入)，多于一个时末尾加一行合计
+    df = pd.DataFrame([{"工作区": n, **workspace_summary(n)} for n in (names or list_workspaces())], columns=WORKSPACE_SUMMARY_COLS)
+    if len(df) < 2: return df
+    n = df["任务数"].sum()
+    total = {**{c: df[c].sum() for c in WORKSPACE_SUMMARY_COLS[1:]}, "工作区": ALL_WORKSPACES,
+             "平均进度": round(float((df["平均进度"] * df["任务数"]).sum() / n), 1) if n else 0.0}
+    return pd.concat([df, pd.DataFrame([total], columns=WORKSPACE_SUMMARY_COLS)], ignore_index=True)
@@ -0,0 +1,68 @@
+"""性能剖析：具名耗时区间 (span) 的记录器与 Chrome trace 输出。"""
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+
+# 性能剖析：PCC_PROFILE=1 或页面地址加 ?profile=1 开启；每次运行记录一串具名耗时区间 (span)，
+# 页面里显示瀑布图，同时以 Chrome trace-event 格式追加到 PROFILE_FILE (chrome://tracing / Perfetto 可直接打开)
+PROFILE_FILE = "profile_trace.json"
+PROFILE_ENV = os.environ.get("PCC_PROFILE", "").lower() in ("1", "true", "yes")
+
+class Profiler:
+    # span 记在线程局部变量里：每个 session 的脚本运行在自己的线程上；未开始记录时 span() 只做一次属性检查
+    def __init__(self):
+        self.local = threading.local()
+        self.file_lock = threading.Lock()
+
+    @property
+    def on(self): return getattr(self.local, "spans", None) is not None
+
+    def begin(self, label):
+        self.local.spans, self.local.depth, self.local.label, self.local.t0 = [], 0, label, perf_counter()
+
+    def end(self):
+        # 结束本次记录，返回 [(名称, 起点 ms, 耗时 ms, 层级)]，第一条是整次运行
+        spans, t0, label = self.local.spans, self.local.t0, self.local.label
+        self.local.spans = None
+        return [(label, 0.0, (perf_counter() - t0) * 1000, 0), *spans]
+
+    @contextmanager
+    def span(self, name):
+        if not self.on:
+            yield
+            return
+        local = self.local
+        start = perf_counter()
+        local.depth += 1
+        try: yield
+        finally:
+            local.depth -= 1
+            local.spans.append((name, (start - local.t0) * 1000, (perf_counter() - start) * 1000, local.depth + 1))
+
+    def write_trace(self, spans, path=PROFILE_FILE):
+        # JSON 数组格式允许省略结尾的 ]，所以可以一直追加
+        wall = datetime.now().timestamp() * 1e6
+        tid = threading.get_ident()
+        lines = [json.dumps({"name": name, "cat": "pcc", "ph": "X", "ts": round(wall + start * 1000), "dur": round(dur * 1000),
+                             "pid": os.getpid(), "tid": tid, "args": {"depth": depth}}, ensure_ascii=False) + ",\n"
+                 for name, start, dur, depth in spans]
+        with self.file_lock, open(path, "a", encoding="utf-8") as f:
+            if f.tell() == 0: f.write("[\n")
+            f.writelines(lines)
+
+PROFILER = Profiler()
+
+def profiled(name=None):
+    # 给函数套一个具名 span；没在记录时直接调用原函数
+    def wrap(fn):
+        label = name or fn.__name__
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not PROFILER.on: return fn(*args, **kwargs)
+            with PROFILER.span(label): return fn(*args, **kwargs)
+        return inner
+    return wrap
@@ -0,0 +1,70 @@
+"""报表：按日期排序的日志索引、区间与分组、Markdown / CSV / JSON 输出。"""
+import io
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from .core import _hot_logs, _load_cached, _load_logs, _load_segment, get_data, get_storage
+from .profiling import profiled
+from .storage import LOG_COLS
+
+REPORT_RANGES = ["近7天", "本周", "本月", "本季度", "自定义"]
+REPORT_GROUPS = ["项目", "类别", "子任务"]
+REPORT_FORMATS = {"Markdown": ("md", "text/markdown"), "CSV": ("csv", "text/csv"), "JSON": ("json", "application/json")}
+
+class LogReport:
+    # 按日期排好序的日志；任意区间用二分查找切片，不再逐行过滤
+    def __init__(self, logs, parsed=False):
+        # parsed: 日期已经是解析好的 datetime 且没有空值 (各段索引切出来再合并时)
+        df = logs if parsed else logs.assign(日期=pd.to_datetime(logs["日期"], errors='coerce')).dropna(subset=["日期"])
+        self.df = df.sort_values("日期", kind="stable").reset_index(drop=True)
+
+    def between(self, start, end):
+        days = self.df["日期"]
+        lo = days.searchsorted(pd.Timestamp(start), side="left")
+        hi = days.searchsorted(pd.Timestamp(end) + pd.Timedelta(days=1), side="left")
+        return self.df.iloc[lo:hi]
+
+@profiled()
+def get_log_report(start=None, end=None):
+    # 不带区间时是全部日志，共享的只读对象，不要在面板里直接修改。
+    # 带区间时只用与区间相交的冷段和热段：各段的日期索引分别缓存，切出区间后再合并成一个小索引
+    if start is None and end is None: return _load_cached("reports", lambda: LogReport(_load_cached("logs", _load_logs)))
+    storage = get_storage()
+    parts = [_load_segment(storage, seg, "reports", LogReport).between(start, end) for seg in storage.log_segments(start, end)]
+    parts.append(_load_cached("reports_hot", lambda: LogReport(_hot_logs())).between(start, end))
+    parts = [df for df in parts if not df.empty] or parts[-1:]
+    return LogReport(pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0], parsed=True)
+
+def report_range(kind, today=None):
+    today = today or date.today()
+    if kind == "本周": return today - timedelta(days=today.weekday()), today
+    if kind == "本月": return today.replace(day=1), today
+    if kind == "本季度": return today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1), today
+    return today - timedelta(days=7), today
+
+@profiled()
+def report_frame(start, end, group_by="项目", tasks=None):
+    # 区间内的日志，附上分组键并按 (分组, 日期) 排序
+    part = get_log_report(start, end).between(start, end)
+    if group_by == "类别":
+        tasks = get_data() if tasks is None else tasks
+        key = part["项目"].map(dict(zip(tasks["任务名称"], tasks["类别"]))).fillna("未分类")
+    elif group_by == "子任务": key = part["项目"].astype(str) + " / " + part["子任务"].astype(str)
+    else: key = part["项目"].astype(str)
+    return part.assign(分组=key).sort_values(["分组", "日期"], kind="stable")
+
+def iter_report_md(part, title):
+    # 逐个分组产出 Markdown 片段；每组的条目行一次性向量化拼好
+    yield f"# 📅 {title}\n生成: {datetime.now().strftime('%Y-%m-%d')}\n\n"
+    lines = "- **" + part["日期"].dt.strftime("%m-%d") + "**: " + part["内容"].astype(str) + " (进度+" + part["贡献进度"].astype(str) + "%)\n"
+    for key, block in lines.groupby(part["分组"], sort=False): yield f"## 📌 {key}\n" + "".join(block) + "\n"
+
+def report_bytes(part, fmt="Markdown", title="工作汇报"):
+    if fmt == "Markdown":
+        buf = io.BytesIO()
+        for chunk in iter_report_md(part, title): buf.write(chunk.encode("utf-8"))
+        return buf.getvalue()
+    out = part[["分组", *LOG_COLS]].assign(日期=part["日期"].dt.strftime("%Y-%m-%d"))
+    if fmt == "CSV": return out.to_csv(index=False).encode("utf-8")
+    return out.to_json(orient="records", force_ascii=False).encode("utf-8")
@@ -0,0 +1,864 @@
+"""存储层：数据文件与列定义、CSV / SQLite 两种存储引擎，以及解析用的小工具。"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from datetime import date, timedelta
+
+import pandas as pd
+
+try: import fcntl  # 进程间文件锁；Windows 上没有，只靠进程内的线程锁
+except ImportError: fcntl = None
+
+DATA_FILE = "life_data.csv"
+LOG_FILE = "project_logs.csv"
+SUBTASK_FILE = "project_subtasks.csv"
+EVENT_FILE = "progress_events.csv"
+SNAPSHOT_DIR = "progress_snapshots"  # 每份快照一个文件 (<序号>.json)
+SEQUENCE_FILE = "id_sequences.csv"
+LOCK_FILE = ".command_center.lock"
+DB_FILE = "command_center.db"
+LOG_ARCHIVE_DIR = "log_archive"
+# 进度事件快照
+SNAPSHOT_EVERY = 500   # 每累计这么多事件落一次快照
+SNAPSHOT_KEEP = 3      # 只留最近几份，最新一份读不了时退回上一份
+# 日志分层: 最近约 LOG_HOT_DAYS 天 (按整月对齐) 的日志留在 project_logs.csv，更早的压成 log_archive/ 下的 parquet 冷段 (当年按月、往年按年)
+LOG_HOT_DAYS = 90
+# 存储引擎: csv (默认, 兼容旧数据) 或 sqlite (单行增量写入)
+STORAGE_ENGINE = os.environ.get("PCC_STORAGE", "csv").lower()
+# 工作区: 默认工作区就是当前目录下原有的数据文件；其他工作区各占 workspaces/<名称>/ 一个目录，里面的文件名和默认工作区相同
+WORKSPACE_DIR = "workspaces"
+DEFAULT_WORKSPACE = "默认"
+WORKSPACE_SUMMARY_FILE = "workspace_summary.json"  # 工作区的汇总行 (带数据版本)，跨工作区概览只读这些
+
+CATEGORY_MAP = {"学术": "STUDY", "大模型": "LLM", "工作": "WORK", "兴趣": "LIFE"}
+CATEGORY_LIST = list(CATEGORY_MAP.keys())
+STATUS_LIST = ["未开始", "进行中", "已完成", "暂停"]
+
+TASK_COLS = ["任务名称", "类别", "重要性(1-10)", "紧急性(1-10)", "当前进度(%)", "状态", "开始时间", "截止日期", "备注", "专属笔记", "项目编号"]
+LOG_COLS = ["日期", "项目", "子任务", "内容", "贡献进度"]
+SUBTASK_COLS = ["子任务ID", "项目编号", "子任务名称", "权重", "完成"]
+# 进度事件流 (只追加): 事件 = log (日志贡献) / done (子任务勾选) / set (手动改进度)
+EVENT_COLS = ["序号", "日期", "项目编号", "子任务ID", "事件", "数值"]
+# 编号序列 (只追加): 序列名 -> 下一个可用号，同一序列取最大值
+SEQUENCE_COLS = ["序列", "下一个"]
+# 旧版本把子任务以 JSON 字符串存在任务表的这一列里，读取时自动拆出
+LEGACY_SUBTASK_COL = "任务分解JSON"
+# 表格编辑器里新增行时的缺省值
+NEW_TASK_DEFAULTS = {"类别": CATEGORY_LIST[0], "重要性(1-10)": 5, "紧急性(1-10)": 5, "当前进度(%)": 0, "状态": "未开始",
+                     "备注": "", "专属笔记": ""}
+
+
+def _file_sig(path):
+    # 整文件重写是换一个新文件 (rename)，所以 inode 也算进版本里
+    try: stat = os.stat(path)
+    except OSError: return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+class WriteLock:
+    # 工作区写锁：进程内是可重入的 RLock，最外层再加一把 flock，同一工作区的界面服务和命令行互斥。
+    # 只有写入方 (读-改-写) 需要它；读取靠原子替换，永远不等锁
+    def __init__(self, path):
+        self.path, self.rlock, self.depth, self.fd = path, threading.RLock(), 0, None
+
+    def __enter__(self):
+        self.rlock.acquire()
+        if self.depth == 0 and fcntl:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0 and self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        self.rlock.release()
+
+_WRITE_LOCKS, _WRITE_LOCKS_GUARD = {}, threading.Lock()
+
+def write_lock(path):
+    # 同一个锁文件在进程内只对应一个 WriteLock：flock 按打开的文件区分，同一进程打开两次也会互相阻塞
+    path = os.path.abspath(path)
+    with _WRITE_LOCKS_GUARD: return _WRITE_LOCKS.setdefault(path, WriteLock(path))
+
+def _atomic_write(path, write, binary=False):
+    # 先写同目录下的临时文件、落盘后再 rename：读者看到的要么是旧文件要么是新文件，不会是写了一半的
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-", suffix="-" + os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+def _append_csv(path, df, cols=None):
+    # 追加写入：整块文本一次 write，沿用已有文件的表头顺序，文件不存在时按 cols 写表头
+    if os.path.exists(path) and os.path.getsize(path):
+        if cols is not None: df = df.reindex(columns=pd.read_csv(path, nrows=0).columns)
+        text = df.to_csv(header=False, index=False)
+    else: text = (df.reindex(columns=cols) if cols is not None else df).to_csv(index=False)
+    with open(path, "a", encoding="utf-8", newline="") as f: f.write(text)
+
+def _same(old, new):
+    try:
+        if pd.isna(old) and pd.isna(new): return True
+    except (TypeError, ValueError): pass
+    try: return bool(old == new)
+    except: return False
+
+def _patch_conflicts(current, updates):
+    # 行级乐观并发：改动所依据的旧值已被别的会话改掉 (或整行已删除) 的行，整行拒绝
+    current = current.drop_duplicates("项目编号").set_index("项目编号")
+    return {pid for pid, col, old, val in updates
+            if pid not in current.index or (col in current.columns and not _same(current.at[pid, col], old))}
+
+def _patch_duplicates(ids, patch):
+    # 改名或新增后会撞号的 项目编号：已被补丁之后仍留着的行占用、在补丁里出现不止一次，或是空的
+    renames = [(pid, val) for pid, col, old, val in patch["updates"] if col == "项目编号"]
+    targets = [str(val) for _, val in renames] + [str(row.get("项目编号", "")) for row in patch["added"]]
+    kept = set(ids) - set(patch["deleted"]) - {pid for pid, _ in renames}
+    return {t for t in targets if not t.strip() or t in kept or targets.count(t) > 1}
+
+# --- 任务表的类型化结构 ---
+# 读进内存的任务帧一律规整成同一个结构，旧文件、两种引擎、表格编辑和外部输入都经过这里：
+# 类别 / 状态是分类列，打分和进度是 int8，日期是 datetime64 (只在读入时解析一次)，文本列缺失为 ""
+TASK_INT_RANGES = {"重要性(1-10)": (1, 10), "紧急性(1-10)": (1, 10), "当前进度(%)": (0, 100)}
+TASK_DATE_COLS = ("开始时间", "截止日期")
+TASK_CATEGORIES = {"类别": CATEGORY_LIST, "状态": STATUS_LIST}
+# 长文本列不放进常驻的任务帧，用到时按 项目编号 单独读一列 (core.get_notes)
+TASK_LAZY_COLS = ("专属笔记",)
+
+def _date_default(col):
+    today = pd.Timestamp.now().normalize()
+    return today + timedelta(7) if col == "截止日期" else today
+
+def _parse_dates(s):
+    # 自己写出的文件都是 ISO 日期，先整列按 ISO 解析；只有解析失败的个别值再逐个猜格式
+    ts = pd.to_datetime(s, errors="coerce", format="ISO8601")
+    retry = ts.isna() & s.notna() & (s.astype(str).str.strip() != "")
+    if retry.any(): ts[retry] = pd.to_datetime(s[retry].astype(str), errors="coerce", format="mixed")
+    return ts
+
+def coerce_task_value(col, val):
+    # 单个单元格按结构规整 (表格编辑、补丁)；无法解析的日期为 NaT，写入时再补缺省值
+    if col in TASK_DATE_COLS:
+        ts = pd.to_datetime(val, errors="coerce")
+        return pd.NaT if pd.isna(ts) else ts.normalize()
+    if col in TASK_INT_RANGES:
+        num, (lo, hi) = pd.to_numeric(val, errors="coerce"), TASK_INT_RANGES[col]
+        return NEW_TASK_DEFAULTS[col] if pd.isna(num) else int(min(max(round(num), lo), hi))
+    return val
+
+def coerce_tasks(df, lazy=()):
+    # 任意来源的任务帧 -> 结构化任务帧 (列顺序同 TASK_COLS，lazy 中的列不带)；缺列、空值按缺省值补齐，数值截断到合法范围
+    out = {}
+    for col in TASK_COLS:
+        if col in lazy: continue
+        s = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if col in TASK_INT_RANGES:
+            lo, hi = TASK_INT_RANGES[col]
+            s = pd.to_numeric(s, errors="coerce").fillna(NEW_TASK_DEFAULTS[col]).round().clip(lo, hi).astype("int8")
+        elif col in TASK_DATE_COLS:
+            s = (s if pd.api.types.is_datetime64_dtype(s) else _parse_dates(s)).dt.normalize().fillna(_date_default(col)).astype("datetime64[ns]")
+        elif col in TASK_CATEGORIES:
+            if not isinstance(s.dtype, pd.CategoricalDtype) or list(s.cat.categories[:len(TASK_CATEGORIES[col])]) != TASK_CATEGORIES[col]:
+                s = s.astype(object).where(s.notna() & (s.astype(str).str.strip() != ""), NEW_TASK_DEFAULTS[col]).astype(str)
+                known = TASK_CATEGORIES[col]
+                s = s.astype(pd.CategoricalDtype(known + sorted(set(s.unique()) - set(known))))
+        else: s = s.where(s.notna(), "").astype(str)
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+def set_task_cells(df, mask, col, values):
+    # 分类列写入新出现的取值前先补上类别；int8 列先把整列取值转成 int8 (已截断到合法范围)，否则 pandas 会按不兼容类型告警
+    if isinstance(df[col].dtype, pd.CategoricalDtype):
+        new = set(pd.Series(values, dtype=object).dropna().astype(str)) - set(df[col].cat.categories)
+        if new: df[col] = df[col].cat.add_categories(sorted(new))
+    elif col in TASK_INT_RANGES and isinstance(values, pd.Series): values = values.astype(df[col].dtype)
+    df.loc[mask, col] = values
+
+def _parse_subtasks(raw):
+    if isinstance(raw, list): return raw
+    try: subs = json.loads(raw)
+    except: return []
+    return subs if isinstance(subs, list) else []
+
+def _legacy_subtasks(df):
+    if LEGACY_SUBTASK_COL not in df.columns: return pd.DataFrame(columns=SUBTASK_COLS)
+    rows = [[s.get("id"), pid, s.get("name"), s.get("weight"), s.get("done")]
+            for pid, raw in zip(df["项目编号"], df[LEGACY_SUBTASK_COL]) for s in _parse_subtasks(raw)]
+    return pd.DataFrame(rows, columns=SUBTASK_COLS)
+
+def _subtask_frame(pid, subs):
+    return pd.DataFrame([[s["id"], pid, s["name"], s["weight"], s["done"]] for s in subs], columns=SUBTASK_COLS)
+
+def _log_day(v):
+    # 事件和日志的日期几乎都是 ISO 字符串，先走快速路径，逐个调 to_datetime 太慢
+    if isinstance(v, str):
+        try: return date.fromisoformat(v[:10])
+        except ValueError: pass
+    ts = pd.to_datetime(v, errors='coerce')
+    return None if pd.isna(ts) else ts.date()
+
+def _contrib(v):
+    v = pd.to_numeric(v, errors='coerce')
+    return 0.0 if pd.isna(v) else float(v)
+
+def _iso_day(d): return None if d is None else pd.Timestamp(d).strftime("%Y-%m-%d")
+
+def _log_cutoff(hot_days=LOG_HOT_DAYS, today=None):
+    # 早于这一天 (整月对齐) 的日志归入冷段；冷段总是完整的自然月
+    return ((today or date.today()) - timedelta(days=hot_days)).replace(day=1)
+
+def filter_logs(df, since=None, until=None, project=None):
+    # 按日期区间 (含两端) 和项目名筛日志；带日期条件时日期无法解析的行不算在内
+    mask = pd.Series(True, index=df.index)
+    if project is not None: mask &= df["项目"] == project
+    if since is not None or until is not None:
+        days = _parse_dates(df["日期"])
+        if since is not None: mask &= days >= pd.Timestamp(since)
+        if until is not None: mask &= days < pd.Timestamp(until) + pd.Timedelta(days=1)
+    return df[mask]
+
+LOG_SUMMARY_COLS = ["项目", "子任务", "条数", "贡献进度"]
+
+def log_summary(df):
+    # 汇总行: (项目, 子任务) -> 条数、贡献合计；冷段的汇总行单独存一份，整段落在区间内时不用打开段文件
+    g = pd.to_numeric(df["贡献进度"], errors="coerce").fillna(0).astype(float).groupby([df["项目"], df["子任务"]], dropna=False).agg(["size", "sum"])
+    return pd.DataFrame({"项目": g.index.get_level_values(0), "子任务": g.index.get_level_values(1),
+                         "条数": g["size"].to_numpy(), "贡献进度": g["sum"].to_numpy()})
+
+def _segment_frame(rows):
+    # 冷段的列类型固定: ISO 日期字符串、文本列、数值贡献 (全是整数时存整数)
+    out = rows[LOG_COLS].copy()
+    for col in ("项目", "子任务", "内容"): out[col] = out[col].astype(object).where(out[col].isna(), out[col].astype(str))
+    num = pd.to_numeric(out["贡献进度"], errors="coerce")
+    out["贡献进度"] = num.astype("int64") if num.notna().all() and (num % 1 == 0).all() else num
+    return out.sort_values("日期", kind="stable").reset_index(drop=True)
+
+def parse_weight(v):
+    try: return 0 if pd.isna(v) else int(v)
+    except (TypeError, ValueError): return 0
+
+class SubtaskStore:
+    # 子任务的解析对象缓存：子任务ID -> 对象，按 项目编号 分组；进度由进度引擎计算
+    def __init__(self, df=None):
+        self.items, self.by_pid = {}, {}
+        if df is not None:
+            for sub_id, pid, name, weight, done in df[SUBTASK_COLS].itertuples(index=False):
+                self._add(pid, {"id": sub_id, "name": name, "weight": weight, "done": done})
+
+    def _add(self, pid, sub):
+        sub = {"id": sub["id"], "name": "" if pd.isna(sub["name"]) else str(sub["name"]),
+               "weight": parse_weight(sub["weight"]), "done": bool(sub["done"]) if not pd.isna(sub["done"]) else False}
+        self.items[sub["id"]] = (pid, sub)
+        self.by_pid.setdefault(pid, []).append(sub["id"])
+
+    def for_task(self, pid): return [dict(self.items[i][1]) for i in self.by_pid.get(pid, [])]
+
+    def names(self, pid): return [self.items[i][1]["name"] for i in self.by_pid.get(pid, [])]
+
+    def replace(self, pid, subs):
+        new_ids = [s["id"] for s in subs]
+        for sub_id in set(self.by_pid.get(pid, [])) - set(new_ids): self.items.pop(sub_id)
+        self.by_pid[pid] = []
+        for s in subs:
+            if s["id"] in self.items: self.items.pop(s["id"])
+            self._add(pid, s)
+        self.by_pid[pid] = new_ids
+
+    def remove_task(self, pid):
+        for sub_id in self.by_pid.pop(pid, []): self.items.pop(sub_id)
+
+    def rename_task(self, pid, new_pid):
+        subs = self.for_task(pid)
+        self.remove_task(pid)
+        for s in subs: self._add(new_pid, s)
+
+class CsvStorage:
+    # 原始 CSV 文件存储；改动整文件重写 (原子替换)，新增行直接追加；所有写入都在工作区写锁内
+    name = "csv"
+
+    def __init__(self, data_file=DATA_FILE, log_file=LOG_FILE, subtask_file=SUBTASK_FILE, event_file=EVENT_FILE, snapshot_dir=SNAPSHOT_DIR,
+                 sequence_file=SEQUENCE_FILE, lock_file=LOCK_FILE, archive_dir=LOG_ARCHIVE_DIR):
+        self.data_file, self.log_file, self.subtask_file = data_file, log_file, subtask_file
+        self.event_file, self.snapshot_dir, self.sequence_file = event_file, snapshot_dir, sequence_file
+        self.archive_dir, self.manifest_file = archive_dir, os.path.join(archive_dir, "manifest.json")
+        self.write_lock, self._manifest_memo, self._summary_memo = write_lock(lock_file), (None, {"segments": []}), (None, None)
+
+    def sig(self, kind):
+        if kind == "subtasks":
+            # 尚未拆分出子任务文件时，子任务仍内嵌在任务文件的 JSON 列里
+            return _file_sig(self.subtask_file) if os.path.exists(self.subtask_file) else ("legacy", _file_sig(self.data_file))
+        if kind == "logs": return (_file_sig(self.log_file), _file_sig(self.manifest_file))
+        return _file_sig({"tasks": self.data_file, "events": self.event_file, "sequences": self.sequence_file}[kind])
+
+    def _read_tasks(self, skip=()):
+        if not os.path.exists(self.data_file): return pd.DataFrame(columns=TASK_COLS)
+        try: return pd.read_csv(self.data_file, usecols=lambda c: c not in skip, dtype={"类别": "category", "状态": "category"})
+        except: return pd.DataFrame(columns=TASK_COLS)
+
+    def load_tasks(self, lazy=False):
+        # lazy=True 时不读长文本列 (连同旧的 任务分解JSON 列都不解析)
+        skip = (LEGACY_SUBTASK_COL, *TASK_LAZY_COLS) if lazy else (LEGACY_SUBTASK_COL,)
+        return coerce_tasks(self._read_tasks(skip), skip)
+
+    def load_task_column(self, col):
+        # 项目编号 -> 某一列的值，只解析这两列
+        if not os.path.exists(self.data_file): return pd.Series(dtype=object)
+        df = pd.read_csv(self.data_file, usecols=lambda c: c in ("项目编号", col), dtype=str, keep_default_na=False)
+        s = pd.Series(df[col].values if col in df.columns else "", index=df["项目编号"], dtype=object)
+        return s[~s.index.duplicated()]
+
+    def load_subtasks(self):
+        if os.path.exists(self.subtask_file): return pd.read_csv(self.subtask_file)
+        return _legacy_subtasks(self._read_tasks())
+
+    def _save_subtasks(self, df):
+        with self.write_lock: _atomic_write(self.subtask_file, lambda f: df[SUBTASK_COLS].to_csv(f, index=False))
+
+    def _ensure_subtask_file(self):
+        # 首次写入前把旧的 任务分解JSON 列拆成独立的子任务文件
+        with self.write_lock:
+            if not os.path.exists(self.subtask_file): self._save_subtasks(self.load_subtasks())
+
+    def save_tasks(self, df):
+        with self.write_lock:
+            self._ensure_subtask_file()
+            # 不带长文本列的帧 (get_data 的结果) 整表写回时，这些列按 项目编号 沿用文件里的值
+            for col in TASK_LAZY_COLS:
+                if col not in df.columns: df = df.assign(**{col: df["项目编号"].map(self.load_task_column(col))})
+            df = df.drop(columns=[LEGACY_SUBTASK_COL], errors="ignore")
+            _atomic_write(self.data_file, lambda f: df.to_csv(f, index=False, date_format="%Y-%m-%d"))
+
+    def fill_pids(self, fill):
+        # fill: 行位置 -> 补上的 项目编号 (旧数据缺编号的行)。按行位置写回原文件，长文本列和内嵌的子任务都留在原行上
+        with self.write_lock:
+            df = self._read_tasks()
+            ids = (df["项目编号"] if "项目编号" in df.columns else pd.Series(None, index=df.index)).astype(object)
+            blank = ids.isna() | (ids.astype(str).str.strip() == "")
+            fill = {pos: pid for pos, pid in fill.items() if pos < len(df) and blank.iloc[pos]}
+            if not fill: return
+            ids.iloc[list(fill)] = list(fill.values())
+            df["项目编号"] = ids
+            if not os.path.exists(self.subtask_file): self._save_subtasks(_legacy_subtasks(df))
+            df = df.drop(columns=[LEGACY_SUBTASK_COL], errors="ignore")
+            _atomic_write(self.data_file, lambda f: df.to_csv(f, index=False))
+
+    def insert_task(self, row, subs=()): self.insert_tasks([(row, subs)])
+
+    def insert_tasks(self, items):
+        # items: [(任务行, 子任务)]；新任务只追加到文件末尾，不重写已有行
+        with self.write_lock:
+            self._ensure_subtask_file()
+            _append_csv(self.data_file, pd.DataFrame([row for row, _ in items]), TASK_COLS)
+            subs = [[s["id"], row["项目编号"], s["name"], s["weight"], s["done"]] for row, task_subs in items for s in task_subs]
+            if subs: _append_csv(self.subtask_file, pd.DataFrame(subs, columns=SUBTASK_COLS), SUBTASK_COLS)
+
+    def update_task(self, pid, fields):
+        self.apply_patch({"updates": [(pid, col, None, val) for col, val in fields.items()], "added": [], "deleted": []})
+
+    def conflicts(self, patch): return _patch_conflicts(self.load_tasks(), patch["updates"])
+
+    def duplicates(self, patch):
+        if not os.path.exists(self.data_file): return _patch_duplicates((), patch)
+        df = pd.read_csv(self.data_file, usecols=lambda c: c == "项目编号", dtype=str, keep_default_na=False)
+        return _patch_duplicates(df["项目编号"] if "项目编号" in df.columns else (), patch)
+
+    def apply_patch(self, patch):
+        with self.write_lock: self._apply_patch(patch)
+
+    def _apply_patch(self, patch):
+        df = self.load_tasks()
+        # 按列批量赋值，行一律按改动前的 项目编号 定位
+        by_col, keys = {}, df["项目编号"]
+        for pid, col, old, val in patch["updates"]: by_col.setdefault(col, {})[pid] = val
+        for col, vals in by_col.items():
+            hit = keys.isin(list(vals))
+            if hit.any() and col in df.columns: set_task_cells(df, hit, col, keys[hit].map({pid: coerce_task_value(col, v) for pid, v in vals.items()}))
+        df = df[~df["项目编号"].isin(patch["deleted"])]
+        if patch["added"]: df = pd.concat([df, coerce_tasks(pd.DataFrame(patch["added"]))], ignore_index=True)
+        self.save_tasks(df)
+        renames = {pid: val for pid, col, old, val in patch["updates"] if col == "项目编号"}
+        if renames or patch["deleted"]:
+            subs = self.load_subtasks()
+            subs = subs[~subs["项目编号"].isin(patch["deleted"])]
+            subs["项目编号"] = subs["项目编号"].replace(renames)
+            self._save_subtasks(subs)
+
+    def replace_subtasks(self, pid, subs):
+        with self.write_lock:
+            self._ensure_subtask_file()
+            df = self.load_subtasks()
+            self._save_subtasks(pd.concat([df[df["项目编号"] != pid], _subtask_frame(pid, subs)], ignore_index=True))
+
+    def append_log(self, row): self.append_logs([row])
+
+    def append_logs(self, rows):
+        with self.write_lock:
+            self._settle_hot()
+            _append_csv(self.log_file, pd.DataFrame(rows, columns=LOG_COLS))
+
+    # --- 日志：热段 project_logs.csv (原格式，只追加) + 归档的冷段 log_archive/*.parquet ---
+    # 清单 manifest.json 记着每个冷段的月份 / 年份、日期上下界和行数，以及汇总行文件；段文件写出后不再改动，合并时换新文件名
+    def _manifest(self):
+        sig = _file_sig(self.manifest_file)
+        if sig is not None and self._manifest_memo[0] != sig:
+            with open(self.manifest_file, encoding="utf-8") as f: self._manifest_memo = (sig, json.load(f))
+        return self._manifest_memo[1] if sig is not None else {"segments": []}
+
+    def log_segments(self, since=None, until=None, project=None):
+        # 与日期区间相交、且含该项目的冷段 (按时间先后)；只看清单，不打开段文件
+        since, until, root = _iso_day(since), _iso_day(until), os.path.abspath(self.archive_dir)
+        segs = self._manifest()["segments"]
+        if project is not None and segs:
+            summary = self.segment_summary()
+            periods = set(summary.loc[summary["项目"] == project, "段"])
+        return [{**seg, "path": os.path.join(root, seg["file"])} for seg in segs
+                if (since is None or seg["end"] >= since) and (until is None or seg["start"] <= until)
+                and (project is None or seg["period"] in periods)]
+
+    def segment_summary(self):
+        # 各冷段的汇总行 [段, 项目, 子任务, 条数, 贡献进度]；第一次用到时才读，文件名随每次压缩变化
+        name = self._manifest().get("summary")
+        if name is None: return pd.DataFrame(columns=["段", *LOG_SUMMARY_COLS])
+        if self._summary_memo[0] != name: self._summary_memo = (name, pd.read_parquet(os.path.join(self.archive_dir, name)))
+        return self._summary_memo[1]
+
+    def load_log_segment(self, seg): return pd.read_parquet(seg["path"])
+
+    def _drop_archived(self, df, sig):
+        # 上一次压缩已提交清单、但热段还没改写 (中途退出或正在改写)：热段里已归档的行不再算
+        pending = self._manifest().get("compacted")
+        if not pending or sig is None or list(sig) != pending["hot"]: return df
+        return df[~(_parse_dates(df["日期"]) < pd.Timestamp(pending["before"]))]
+
+    def load_hot_logs(self):
+        sig = _file_sig(self.log_file)
+        if sig is None: return pd.DataFrame(columns=LOG_COLS)
+        return self._drop_archived(pd.read_csv(self.log_file), sig)
+
+    def load_logs(self):
+        # 全部日志：冷段按时间先后，热段在最后
+        parts = [self.load_log_segment(seg) for seg in self.log_segments()]
+        hot = self.load_hot_logs()
+        return pd.concat([*parts, hot], ignore_index=True) if parts else hot
+
+    def iter_logs(self, chunksize, since=None, until=None):
+        # since / until 只用来跳过整个冷段，逐行筛选由调用方做
+        for seg in self.log_segments(since, until):
+            df = self.load_log_segment(seg)
+            for lo in range(0, len(df), chunksize): yield df.iloc[lo:lo + chunksize]
+        sig = _file_sig(self.log_file)
+        if sig is None: return
+        for chunk in pd.read_csv(self.log_file, chunksize=chunksize): yield self._drop_archived(chunk, sig)
+
+    def _settle_hot(self):
+        # 持写锁调用：把上一次压缩没做完的热段改写补上
+        pending, sig = self._manifest().get("compacted"), _file_sig(self.log_file)
+        if not pending or sig is None or list(sig) != pending["hot"]: return
+        df = self._drop_archived(pd.read_csv(self.log_file), sig)
+        _atomic_write(self.log_file, lambda f: df.to_csv(f, index=False))
+
+    def log_compaction_due(self, hot_days=LOG_HOT_DAYS, today=None):
+        # 热段里最早的日志已早于分界线时才值得压缩；补录的旧日期追加在末尾，所以看整段的最小日期，只读日期这一列
+        try: days = _parse_dates(pd.read_csv(self.log_file, usecols=["日期"])["日期"])
+        except (OSError, ValueError, pd.errors.EmptyDataError): return False
+        first = days.min()
+        return not pd.isna(first) and first < pd.Timestamp(_log_cutoff(hot_days, today))
+
+    def compact_logs(self, hot_days=LOG_HOT_DAYS, today=None):
+        # 热段里早于分界线的日志并入冷段：分界线所在年份按月分段，更早的整年一段 (月段在那一年过完后折叠进年段)；
+        # 有改动的段整段重写成新文件，先提交清单再改写热段。被替换下来的旧段文件留到下一次压缩再删，按旧清单读取的读者不会扑空
+        cutoff = _log_cutoff(hot_days, today)
+        period = lambda day: day[:4] if day[:4] < cutoff.isoformat()[:4] else day[:7]
+        with self.write_lock:
+            self._settle_hot()
+            manifest = self._manifest()
+            self._sweep(manifest)
+            sig = _file_sig(self.log_file)
+            hot = pd.read_csv(self.log_file) if sig is not None else pd.DataFrame(columns=LOG_COLS)
+            days = _parse_dates(hot["日期"])
+            old = days < pd.Timestamp(cutoff)
+            segs = {seg["period"]: seg for seg in manifest["segments"]}
+            stats = {"moved": int(old.sum()), "hot": int(len(hot) - old.sum()), "cutoff": cutoff.isoformat()}
+            # 新归档的行和需要折叠的月段，按目标段归组
+            pending = {}
+            moved = hot[old].assign(日期=days[old].dt.strftime("%Y-%m-%d"))
+            for key, rows in moved.groupby(moved["日期"].map(period), sort=True): pending.setdefault(key, []).append(rows)
+            for key in [k for k in segs if period(k) != k]: pending.setdefault(period(key), []).append(self._read_segment(segs.pop(key)))
+            if not pending: return {**stats, "segments": len(segs)}
+            os.makedirs(self.archive_dir, exist_ok=True)
+            summary = self.segment_summary()
+            summaries = [summary[summary["段"].isin(segs) & ~summary["段"].isin(pending)]]
+            for key, frames in pending.items():
+                if key in segs: frames = [self._read_segment(segs[key]), *frames]
+                rows = _segment_frame(pd.concat(frames, ignore_index=True))
+                segs[key] = {"period": key, "file": self._write_parquet(f"logs-{key}", rows), "start": rows["日期"].iloc[0],
+                             "end": rows["日期"].iloc[-1], "rows": len(rows)}
+                summaries.append(log_summary(rows).assign(段=key)[["段", *LOG_SUMMARY_COLS]])
+            manifest = {"segments": [segs[k] for k in sorted(segs)], "summary": self._write_parquet("summary", pd.concat([df for df in summaries if not df.empty], ignore_index=True)),
+                        "compacted": {"hot": list(sig or ()), "before": cutoff.isoformat()}}
+            text = json.dumps(manifest, ensure_ascii=False)
+            _atomic_write(self.manifest_file, lambda f: f.write(text))
+            self._settle_hot()
+            return {**stats, "segments": len(segs)}
+
+    def _read_segment(self, seg): return pd.read_parquet(os.path.join(self.archive_dir, seg["file"]))
+
+    def _write_parquet(self, prefix, df):
+        name = f"{prefix}-{uuid.uuid4().hex[:8]}.parquet"
+        _atomic_write(os.path.join(self.archive_dir, name), lambda f: df.to_parquet(f, index=False, compression="zstd"), binary=True)
+        return name
+
+    def _sweep(self, manifest):
+        # 删掉清单不再引用的段文件：上一次压缩替换下来的，或者写出后没来得及提交清单的
+        if not os.path.isdir(self.archive_dir): return
+        keep = {seg["file"] for seg in manifest["segments"]} | {manifest.get("summary")}
+        for name in os.listdir(self.archive_dir):
+            if name.endswith(".parquet") and name not in keep: os.remove(os.path.join(self.archive_dir, name))
+
+    def load_events(self, after=None):
+        # after: 一份快照，只要它之后的事件。事件文件只追加，快照记着写它时文件的长度，从那里接着读；
+        # 对不上 (文件被换过、中间缺号) 时退回读整个文件再筛
+        if not os.path.exists(self.event_file): return pd.DataFrame(columns=EVENT_COLS)
+        read = lambda f, **kw: pd.read_csv(f, dtype={"日期": str, "项目编号": str, "子任务ID": str}, keep_default_na=False, **kw)
+        offset = (after or {}).get("offset")
+        if offset:
+            with open(self.event_file, "rb") as f:
+                f.seek(offset - 1)
+                if f.read(1) == b"\n":
+                    tail = read(f, names=EVENT_COLS, header=None) if f.peek(1) else pd.DataFrame(columns=EVENT_COLS)
+                    if tail.empty or int(tail["序号"].iloc[0]) == after["seq"] + 1: return tail
+        df = read(self.event_file)
+        return df if after is None else df[df["序号"] > after["seq"]].reset_index(drop=True)
+
+    def append_events(self, rows):
+        with self.write_lock: _append_csv(self.event_file, pd.DataFrame(rows, columns=EVENT_COLS))
+
+    def _snapshot_files(self):
+        # 按序号从新到旧
+        if not os.path.isdir(self.snapshot_dir): return []
+        return sorted((n for n in os.listdir(self.snapshot_dir) if n.endswith(".json") and n[:-5].isdigit()), key=lambda n: -int(n[:-5]))
+
+    def load_snapshot(self):
+        # 最新一份能读的快照，没有时返回 None
+        for name in self._snapshot_files():
+            try:
+                with open(os.path.join(self.snapshot_dir, name), encoding="utf-8") as f: return json.load(f)
+            except (OSError, ValueError): continue
+        return None
+
+    def save_snapshot(self, snap):
+        # 每份快照单独写一个文件，只删掉超出 SNAPSHOT_KEEP 的旧文件，不重写历史快照
+        # (json.dumps 走 C 编码器；json.dump 直接写文件时逐块走纯 Python 编码，大状态下慢一个数量级)
+        with self.write_lock:
+            # 快照在追加完它之前的事件后才写，此刻事件文件的长度就是之后事件的起点
+            text = json.dumps({**snap, "offset": os.path.getsize(self.event_file) if os.path.exists(self.event_file) else 0}, ensure_ascii=False)
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            _atomic_write(os.path.join(self.snapshot_dir, f"{snap['seq']}.json"), lambda f: f.write(text))
+            for name in self._snapshot_files()[SNAPSHOT_KEEP:]: os.remove(os.path.join(self.snapshot_dir, name))
+
+    def _read_sequences(self):
+        df = pd.read_csv(self.sequence_file, dtype={"序列": str})
+        return df, {k: int(v) for k, v in df.groupby("序列")["下一个"].max().items()}
+
+    def load_sequences(self):
+        if not os.path.exists(self.sequence_file): return {}
+        df, seqs = self._read_sequences()
+        # 追加的记录攒多了就压缩成每个序列一行 (持锁后重读，不漏掉并发追加的记录)
+        if len(df) > 2 * len(seqs) + 100:
+            with self.write_lock:
+                df, seqs = self._read_sequences()
+                compact = pd.DataFrame(list(seqs.items()), columns=SEQUENCE_COLS)
+                _atomic_write(self.sequence_file, lambda f: compact.to_csv(f, index=False))
+        return seqs
+
+    def save_sequences(self, seqs):
+        with self.write_lock: _append_csv(self.sequence_file, pd.DataFrame(list(seqs.items()), columns=SEQUENCE_COLS))
+
+# SQLite 列名映射 (界面列名 -> 表字段)
+_SQL_TASK_COLS = {"项目编号": "pid", "任务名称": "name", "类别": "category", "重要性(1-10)": "importance", "紧急性(1-10)": "urgency",
+                  "当前进度(%)": "progress", "状态": "status", "开始时间": "start_date", "截止日期": "due_date", "备注": "remark", "专属笔记": "notes"}
+_SQL_LOG_COLS = {"日期": "date", "项目": "project", "子任务": "subtask", "内容": "content", "贡献进度": "progress"}
+
+_SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY, pid TEXT, name TEXT, category TEXT, importance INTEGER, urgency INTEGER,
+    progress REAL, status TEXT, start_date TEXT, due_date TEXT, remark TEXT, notes TEXT);
+CREATE TABLE IF NOT EXISTS subtasks (
+    id INTEGER PRIMARY KEY, task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    sub_id TEXT, name TEXT, weight INTEGER, done INTEGER, pos INTEGER);
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY, date TEXT, project TEXT, subtask TEXT, content TEXT, progress REAL);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY, date TEXT, pid TEXT, sub_id TEXT, kind TEXT, value REAL);
+CREATE TABLE IF NOT EXISTS snapshots (seq INTEGER PRIMARY KEY, state TEXT);
+CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS versions (kind TEXT PRIMARY KEY, v INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_tasks_pid ON tasks(pid);
+CREATE INDEX IF NOT EXISTS idx_tasks_name ON tasks(name);
+CREATE INDEX IF NOT EXISTS idx_subtasks_task ON subtasks(task_id, pos);
+CREATE INDEX IF NOT EXISTS idx_logs_date ON logs(date);
+CREATE INDEX IF NOT EXISTS idx_logs_project ON logs(project, date);
+CREATE INDEX IF NOT EXISTS idx_events_pid ON events(pid, seq);
+CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+INSERT OR IGNORE INTO versions VALUES ('tasks', 0), ('logs', 0), ('subtasks', 0), ('events', 0), ('sequences', 0);
+"""
+
+def _sql_value(v):
+    if v is None or (not isinstance(v, str) and pd.isna(v)): return None
+    if isinstance(v, (date, pd.Timestamp)): return v.strftime("%Y-%m-%d")
+    return v.item() if hasattr(v, "item") else v
+
+class SqliteStorage:
+    # 内嵌 SQLite：按 项目编号 单行 UPDATE/INSERT，写入成本与改动量成正比
+    name = "sqlite"
+
+    def __init__(self, db_file=DB_FILE):
+        # lock 串行化这条共享连接；write_lock 是跨进程的写锁，保证 "检查版本 -> 写入" 之间没有别的写入方插进来
+        self.db_file = db_file
+        self.lock, self.write_lock = threading.RLock(), write_lock(db_file + ".lock")
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(_SQL_SCHEMA)
+
+    def sig(self, kind):
+        with self.lock:
+            return self.conn.execute("SELECT v FROM versions WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def _bump(self, kind): self.conn.execute("UPDATE versions SET v = v + 1 WHERE kind = ?", (kind,))
+
+    def load_tasks(self, lazy=False):
+        cols = [c for c in _SQL_TASK_COLS if not (lazy and c in TASK_LAZY_COLS)]
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {', '.join(_SQL_TASK_COLS[c] for c in cols)} FROM tasks ORDER BY id").fetchall()
+        return coerce_tasks(pd.DataFrame(rows, columns=cols), TASK_LAZY_COLS if lazy else ())
+
+    def load_task_column(self, col):
+        with self.lock: rows = self.conn.execute(f"SELECT pid, {_SQL_TASK_COLS[col]} FROM tasks ORDER BY id").fetchall()
+        s = pd.Series([v if v is not None else "" for _, v in rows], index=[pid for pid, _ in rows], dtype=object)
+        return s[~s.index.duplicated()]
+
+    def _subtask_rows(self):
+        return self.conn.execute(
+            "SELECT s.sub_id, t.pid, s.name, s.weight, s.done FROM subtasks s JOIN tasks t ON t.id = s.task_id ORDER BY s.task_id, s.pos").fetchall()
+
+    def load_subtasks(self):
+        with self.lock: rows = self._subtask_rows()
+        df = pd.DataFrame(rows, columns=SUBTASK_COLS)
+        df["完成"] = df["完成"].astype(bool)
+        return df
+
+    def load_logs(self):
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {', '.join(_SQL_LOG_COLS.values())} FROM logs ORDER BY id").fetchall()
+        return pd.DataFrame(rows, columns=LOG_COLS)
+
+    # 日志整张表带日期索引，没有冷热分层：全表就是"热段"，按区间读取时在缓存好的表上筛
+    def log_segments(self, since=None, until=None, project=None): return []
+
+    def segment_summary(self): return pd.DataFrame(columns=["段", *LOG_SUMMARY_COLS])
+
+    def load_hot_logs(self): return self.load_logs()
+
+    def log_compaction_due(self, hot_days=LOG_HOT_DAYS, today=None): return False
+
+    def compact_logs(self, hot_days=LOG_HOT_DAYS, today=None):
+        with self.lock: rows = self.conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        return {"moved": 0, "hot": rows, "cutoff": _log_cutoff(hot_days, today).isoformat(), "segments": 0}
+
+    def _write_subtasks(self, task_id, subs):
+        self.conn.execute("DELETE FROM subtasks WHERE task_id = ?", (task_id,))
+        self.conn.executemany(
+            "INSERT INTO subtasks (task_id, sub_id, name, weight, done, pos) VALUES (?, ?, ?, ?, ?, ?)",
+            [(task_id, s["id"], s["name"], _sql_value(s["weight"]), int(bool(s["done"])), pos) for pos, s in enumerate(subs)])
+
+    def _insert(self, row, subs=()):
+        cols = [c for c in _SQL_TASK_COLS if c in row]
+        cur = self.conn.execute(
+            f"INSERT INTO tasks ({', '.join(_SQL_TASK_COLS[c] for c in cols)}) VALUES ({', '.join('?' * len(cols))})",
+            [_sql_value(coerce_task_value(c, row[c])) for c in cols])
+        if subs: self._write_subtasks(cur.lastrowid, subs)
+
+    def save_tasks(self, df):
+        with self.write_lock, self.lock, self.conn:
+            # 整表重写时按 项目编号 保留原有子任务
+            keep = {}
+            for sub_id, pid, name, weight, done in self._subtask_rows():
+                keep.setdefault(pid, []).append({"id": sub_id, "name": name, "weight": weight, "done": bool(done)})
+            # 不带长文本列的帧整表写回时，这些列沿用原值
+            lazy = {col: dict(self.conn.execute(f"SELECT pid, {_SQL_TASK_COLS[col]} FROM tasks").fetchall())
+                    for col in TASK_LAZY_COLS if col not in df.columns}
+            self.conn.execute("DELETE FROM tasks")
+            for row in df.to_dict(orient="records"):
+                for col, old in lazy.items(): row[col] = old.get(row.get("项目编号"))
+                self._insert(row, keep.get(row.get("项目编号"), ()))
+            self._bump("tasks"); self._bump("subtasks")
+
+    def fill_pids(self, fill):
+        # 按行位置 (ORDER BY id) 补编号：只改 pid，笔记和子任务都挂在行 id 上不动
+        with self.write_lock, self.lock, self.conn:
+            rows = self.conn.execute("SELECT id, pid FROM tasks ORDER BY id").fetchall()
+            updates = [(pid, rows[pos][0]) for pos, pid in fill.items() if pos < len(rows) and not str(rows[pos][1] or "").strip()]
+            if not updates: return
+            self.conn.executemany("UPDATE tasks SET pid = ? WHERE id = ?", updates)
+            self._bump("tasks"); self._bump("subtasks")
+
+    def insert_task(self, row, subs=()): self.insert_tasks([(row, subs)])
+
+    def insert_tasks(self, items):
+        with self.write_lock, self.lock, self.conn:
+            for row, subs in items: self._insert(row, subs)
+            self._bump("tasks")
+            if any(subs for _, subs in items): self._bump("subtasks")
+
+    def _update(self, pid, fields):
+        cols = [c for c in fields if c in _SQL_TASK_COLS]
+        if cols:
+            self.conn.execute(f"UPDATE tasks SET {', '.join(f'{_SQL_TASK_COLS[c]} = ?' for c in cols)} WHERE pid = ?",
+                              [_sql_value(coerce_task_value(c, fields[c])) for c in cols] + [pid])
+
+    def update_task(self, pid, fields):
+        with self.write_lock, self.lock, self.conn:
+            self._update(pid, fields)
+            self._bump("tasks")
+
+    def conflicts(self, patch):
+        pids = list({pid for pid, *_ in patch["updates"]})
+        rows = []
+        with self.lock:
+            for lo in range(0, len(pids), 500):
+                part = pids[lo:lo + 500]
+                rows += self.conn.execute(f"SELECT {', '.join(_SQL_TASK_COLS.values())} FROM tasks WHERE pid IN ({', '.join('?' * len(part))})",
+                                          part).fetchall()
+        return _patch_conflicts(coerce_tasks(pd.DataFrame(rows, columns=list(_SQL_TASK_COLS))), patch["updates"])
+
+    def duplicates(self, patch):
+        with self.lock: ids = [pid for pid, in self.conn.execute("SELECT pid FROM tasks").fetchall()]
+        return _patch_duplicates(ids, patch)
+
+    def apply_patch(self, patch):
+        by_pid = {}
+        for pid, col, old, val in patch["updates"]: by_pid.setdefault(pid, {})[col] = val
+        with self.write_lock, self.lock, self.conn:
+            for pid, fields in by_pid.items(): self._update(pid, fields)
+            self.conn.executemany("DELETE FROM tasks WHERE pid = ?", [(pid,) for pid in patch["deleted"]])
+            for row in patch["added"]: self._insert(row)
+            self._bump("tasks")
+            if patch["deleted"] or any(col == "项目编号" for _, col, _, _ in patch["updates"]): self._bump("subtasks")
+
+    def replace_subtasks(self, pid, subs):
+        with self.write_lock, self.lock, self.conn:
+            for (task_id,) in self.conn.execute("SELECT id FROM tasks WHERE pid = ?", (pid,)).fetchall():
+                self._write_subtasks(task_id, subs)
+            self._bump("subtasks")
+
+    def append_log(self, row): self.append_logs([row])
+
+    def append_logs(self, rows):
+        with self.write_lock, self.lock, self.conn:
+            self.conn.executemany(f"INSERT INTO logs ({', '.join(_SQL_LOG_COLS.values())}) VALUES (?, ?, ?, ?, ?)",
+                                  [[_sql_value(v) for v in row] for row in rows])
+            self._bump("logs")
+
+    def iter_logs(self, chunksize, since=None, until=None):
+        # 按主键分页读取，每页单独持锁；since / until 同 CsvStorage，由调用方逐行筛选
+        last = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(f"SELECT id, {', '.join(_SQL_LOG_COLS.values())} FROM logs WHERE id > ? ORDER BY id LIMIT ?",
+                                         (last, chunksize)).fetchall()
+            if not rows: return
+            last = rows[-1][0]
+            yield pd.DataFrame([r[1:] for r in rows], columns=LOG_COLS)
+
+    def load_events(self, after=None):
+        seq = after["seq"] if after else 0
+        with self.lock: rows = self.conn.execute("SELECT seq, date, pid, sub_id, kind, value FROM events WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        return pd.DataFrame(rows, columns=EVENT_COLS)
+
+    def append_events(self, rows):
+        with self.write_lock, self.lock, self.conn:
+            self.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)", [[_sql_value(v) for v in r] for r in rows])
+            self._bump("events")
+
+    def load_snapshot(self):
+        with self.lock: row = self.conn.execute("SELECT seq, state FROM snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+        return {"seq": row[0], "state": json.loads(row[1])} if row else None
+
+    def save_snapshot(self, snap):
+        with self.write_lock, self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO snapshots (seq, state) VALUES (?, ?)", (snap["seq"], json.dumps(snap["state"], ensure_ascii=False)))
+            self.conn.execute("DELETE FROM snapshots WHERE seq NOT IN (SELECT seq FROM snapshots ORDER BY seq DESC LIMIT ?)", (SNAPSHOT_KEEP,))
+
+    def load_sequences(self):
+        with self.lock: return dict(self.conn.execute("SELECT name, next FROM sequences").fetchall())
+
+    def save_sequences(self, seqs):
+        with self.write_lock, self.lock, self.conn:
+            self.conn.executemany("INSERT INTO sequences VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET next = max(next, excluded.next)",
+                                  list(seqs.items()))
+            self._bump("sequences")
+
+def migrate_csv_to_sqlite(data_file=DATA_FILE, log_file=LOG_FILE, db_file=DB_FILE, src=None):
+    # 一次性迁移: 把现有的 CSV 文件 (或 src 指定的 CSV 存储) 导入空的 SQLite 库
+    src, dst = src or CsvStorage(data_file, log_file), SqliteStorage(db_file)
+    with dst.write_lock, dst.lock, dst.conn:
+        subs = SubtaskStore(src.load_subtasks())
+        # 还没拆出子任务文件时，缺 项目编号 的旧行按行位置取自己那一行内嵌的子任务 (编号稍后由 core 补上)
+        raw = None if os.path.exists(src.subtask_file) else src._read_tasks()
+        for pos, row in enumerate(src.load_tasks().to_dict(orient="records")):
+            legacy = raw is not None and not row["项目编号"].strip()
+            dst._insert(row, SubtaskStore(_legacy_subtasks(raw.iloc[[pos]]).assign(项目编号="")).for_task("") if legacy else subs.for_task(row["项目编号"]))
+        dst.conn.executemany(f"INSERT INTO logs ({', '.join(_SQL_LOG_COLS.values())}) VALUES (?, ?, ?, ?, ?)",
+                             [[_sql_value(v) for v in r] for r in src.load_logs()[LOG_COLS].itertuples(index=False)])
+        dst.conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                             [[_sql_value(v) for v in r] for r in src.load_events()[EVENT_COLS].itertuples(index=False)])
+        dst._bump("tasks"); dst._bump("logs"); dst._bump("subtasks"); dst._bump("events")
+    snap = src.load_snapshot()
+    if snap: dst.save_snapshot(snap)
+    dst.save_sequences(src.load_sequences())
+    return dst
+
+# --- 工作区 ---
+def check_workspace(name):
+    # 工作区名称就是目录名：不能为空、不能有首尾空白和路径分隔符、不能以 . 开头
+    if name == DEFAULT_WORKSPACE: return name
+    if not isinstance(name, str) or not name.strip() or name != name.strip() or name.startswith(".") or any(c in name for c in "/\\:"):
+        raise ValueError(f"工作区名称不合法: {name!r}")
+    return name
+
+def workspace_path(workspace, name):
+    return name if workspace == DEFAULT_WORKSPACE else os.path.join(WORKSPACE_DIR, check_workspace(workspace), name)
+
+def list_workspaces():
+    # 默认工作区在前，其余按名称排序
+    names = sorted(n for n in os.listdir(WORKSPACE_DIR) if os.path.isdir(os.path.join(WORKSPACE_DIR, n))) if os.path.isdir(WORKSPACE_DIR) else []
+    return [DEFAULT_WORKSPACE, *(n for n in names if n != DEFAULT_WORKSPACE and not n.startswith("."))]
+
+def create_workspace(name):
+    if check_workspace(name) != DEFAULT_WORKSPACE: os.makedirs(os.path.join(WORKSPACE_DIR, name), exist_ok=True)
+    return name
+
+def open_storage(engine=STORAGE_ENGINE, workspace=DEFAULT_WORKSPACE):
+    # 打开某个工作区的存储 (没有就建好目录)；sqlite 引擎第一次打开时把该工作区已有的 CSV 文件迁移进库
+    create_workspace(workspace)
+    path = lambda name: workspace_path(workspace, name)
+    csv = CsvStorage(path(DATA_FILE), path(LOG_FILE), path(SUBTASK_FILE), path(EVENT_FILE), path(SNAPSHOT_DIR), path(SEQUENCE_FILE),
+                     path(LOCK_FILE), path(LOG_ARCHIVE_DIR))
+    if engine != "sqlite": return csv
+    if not os.path.exists(path(DB_FILE)) and (os.path.exists(csv.data_file) or os.path.exists(csv.log_file)):
+        return migrate_csv_to_sqlite(db_file=path(DB_FILE), src=csv)
+    return SqliteStorage(path(DB_FILE))
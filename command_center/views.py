@@ -0,0 +1,105 @@
+"""甘特图与四象限的视图数据和 Plotly 图：Plotly 只在真正画图时才导入。"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import pandas as pd
+
+from .caching import resource
+from .core import _sig, current_workspace, get_storage
+from .profiling import PROFILER, profiled
+
+# --- 甘特图 ---
+GANTT_GROUPS = {"类别": "类别", "状态": "状态", "不分组": None}
+GANTT_PAGE_ROWS = 30     # 每页最多渲染的行数
+GANTT_DETAIL_DAYS = 180  # 时间窗口跨度超过这个天数时，各分组聚合成一条汇总条
+GANTT_COLORS = {"已完成": "#28a745", "进行中": "#6f42c1", "未开始": "#999", "汇总": "#1f77b4"}
+GANTT_ROW_COLS = ["行", "项目编号", "开始时间", "截止日期", "状态", "当前进度(%)", "任务数"]
+VIEW_CACHE_SIZE = 32
+
+@resource
+def _view_cache():
+    # 跨 session 共享的 LRU: (引擎, 工作区, 视图种类, 任务数据版本, 排队改动版本, 视图参数) -> 构建好的行 / figure
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def cached_view(kind, params, builder, data=None):
+    # data: 视图所依据的任务帧。叠加了排队改动的帧 (attrs["overlay"]) 与磁盘上的同版本数据分开缓存
+    version = (data.attrs.get("version"), data.attrs.get("overlay")) if data is not None else (_sig("tasks"), None)
+    cache, key = _view_cache(), (get_storage().name, current_workspace(), kind, version, params)
+    with cache["lock"]:
+        if key in cache["entries"]:
+            cache["entries"].move_to_end(key)
+            return cache["entries"][key]
+    with PROFILER.span(f"构建 {kind}"): obj = builder()
+    with cache["lock"]:
+        cache["entries"][key] = obj
+        while len(cache["entries"]) > VIEW_CACHE_SIZE: cache["entries"].popitem(last=False)
+    return obj
+
+def gantt_zoomed_out(window): return window is not None and (window[1] - window[0]).days > GANTT_DETAIL_DAYS
+
+@profiled()
+def gantt_rows(df, group_by=None, collapsed=(), window=None):
+    # 与时间窗口相交的甘特行：每个分组一条汇总条，未折叠且未缩小视图的分组再展开各任务
+    if window: df = df[(df["截止日期"] >= pd.Timestamp(window[0])) & (df["开始时间"] <= pd.Timestamp(window[1]))]
+    if df.empty: return pd.DataFrame(columns=GANTT_ROW_COLS)
+    df = df.sort_values(["开始时间", "截止日期"]).assign(行=df["任务名称"], 任务数=1)
+    if not group_by: return df[GANTT_ROW_COLS]
+    parts = []
+    for key, g in df.groupby(df[group_by].astype(str), sort=True):
+        parts.append(pd.DataFrame([[f"▸ {key} ({len(g)})", None, g["开始时间"].min(), g["截止日期"].max(), "汇总",
+                                    round(pd.to_numeric(g["当前进度(%)"], errors='coerce').mean()), len(g)]], columns=GANTT_ROW_COLS))
+        if not gantt_zoomed_out(window) and key not in collapsed: parts.append(g.assign(行="　" + g["任务名称"])[GANTT_ROW_COLS])
+    return pd.concat(parts, ignore_index=True)
+
+@profiled()
+def build_gantt(rows, page=0, window=None):
+    # 只把当前页的行画出来，高度与总任务数无关
+    import plotly.express as px
+    part = rows.iloc[page * GANTT_PAGE_ROWS:(page + 1) * GANTT_PAGE_ROWS]
+    fig = px.timeline(part, x_start="开始时间", x_end="截止日期", y="行", color="状态", height=160 + len(part) * 28,
+                      hover_data={"项目编号": True, "当前进度(%)": True, "任务数": True}, color_discrete_map=GANTT_COLORS)
+    fig.update_yaxes(autorange="reversed", title=None)
+    if window: fig.update_xaxes(range=[window[0], window[1] + timedelta(days=1)])
+    return fig
+
+# --- 四象限 ---
+QUADRANT_WEBGL_MIN = 150  # 任务数超过这个值时改用 WebGL，并把同一格子里的任务聚成一个计数气泡
+QUADRANT_AXES = ("紧急性(1-10)", "重要性(1-10)")
+
+def _grid(s): return pd.to_numeric(s, errors='coerce').fillna(5).round().clip(1, 10).astype(int)
+
+class QuadrantIndex:
+    # (紧急性, 重要性) 整数格 -> 格子里任务的行 index；点击任意一点都能 O(1) 取回同格的全部任务
+    def __init__(self, df):
+        # 一次 groupby 算出每格的行、首个任务名和类别数，不再逐格切片
+        grid = pd.DataFrame({"u": _grid(df[QUADRANT_AXES[0]]).to_numpy(), "i": _grid(df[QUADRANT_AXES[1]]).to_numpy(),
+                             "名称": df["任务名称"].to_numpy(), "类别": df["类别"].astype(str).to_numpy()})
+        groups = grid.groupby(["u", "i"], sort=False)
+        agg, pos = groups.agg(任务数=("名称", "size"), 名称=("名称", "first"), 类别=("类别", "first"), 类别数=("类别", "nunique")), groups.indices
+        self.cells = {(int(u), int(i)): list(df.index[pos[(u, i)]]) for u, i in agg.index}
+        self.clusters = pd.DataFrame({QUADRANT_AXES[0]: agg.index.get_level_values(0).astype(int), QUADRANT_AXES[1]: agg.index.get_level_values(1).astype(int),
+                                      "任务数": agg["任务数"].to_numpy(),
+                                      "标签": agg["名称"].where(agg["任务数"] == 1, agg["任务数"].astype(str) + " 项").to_numpy(),
+                                      "类别": agg["类别"].where(agg["类别数"] == 1, "混合").to_numpy()})
+
+    def lookup(self, x, y):
+        try: return self.cells.get((int(round(float(x))), int(round(float(y)))), [])
+        except (TypeError, ValueError): return []
+
+@profiled()
+def build_quadrant(df, qi):
+    import plotly.express as px
+    if len(df) > QUADRANT_WEBGL_MIN:
+        fig = px.scatter(qi.clusters, x=QUADRANT_AXES[0], y=QUADRANT_AXES[1], color="类别", size="任务数", text="标签", size_max=48,
+                         hover_data={"任务数": True}, range_x=[0,11], range_y=[0,11], height=500, render_mode="webgl")
+        fig.update_traces(textposition='top center', marker=dict(line=dict(width=1, color='gray')))
+    else:
+        fig = px.scatter(df, x=QUADRANT_AXES[0], y=QUADRANT_AXES[1], color="类别", text="任务名称", range_x=[0,11], range_y=[0,11], height=500)
+        fig.update_traces(textposition='top center', marker=dict(size=18, line=dict(width=1, color='gray')))
+    fig.add_shape(type="rect", x0=5.5, y0=5.5, x1=11, y1=11, fillcolor="rgba(255,0,0,0.1)", layer="below", line_width=0)
+    fig.add_shape(type="rect", x0=0, y0=5.5, x1=5.5, y1=11, fillcolor="rgba(0,0,255,0.1)", layer="below", line_width=0)
+    fig.add_shape(type="rect", x0=5.5, y0=0, x1=11, y1=5.5, fillcolor="rgba(255,165,0,0.1)", layer="below", line_width=0)
+    fig.add_shape(type="rect", x0=0, y0=0, x1=5.5, y1=5.5, fillcolor="rgba(0,128,0,0.1)", layer="below", line_width=0)
+    fig.update_layout(plot_bgcolor='white', xaxis=dict(showgrid=False), yaxis=dict(showgrid=False), margin=dict(l=20,r=20,t=20,b=20), font=dict(size=14))
+    return fig
@@ -0,0 +1,238 @@
+"""写后持久化：界面提交改动后立即返回，后台线程把一小段时间内连续的改动合并成一次写入。
+
+排队中的改动叠加在读取结果上 (WriteBehind.get_data / get_logs / get_note / subtasks)，提交者马上就能看到；
+落盘失败或与其他会话冲突时，消息按会话留给界面 (WriteBehind.notes)。进程退出前会把队列写完。
+每个工作区一条队列 (get_write_behind)，队列里的读写都在它自己的工作区里进行。
+"""
+import atexit
+import copy
+import functools
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from . import core
+from .caching import resource
+from .storage import DEFAULT_WORKSPACE, LOG_COLS, TASK_LAZY_COLS, _contrib, _same, coerce_task_value, coerce_tasks, filter_logs, set_task_cells
+
+# 收到第一条改动后再等这么久 (秒)，把连续的勾选、编辑攒成一次写入
+WRITE_DELAY = 0.15
+# 退出时最多等待队列写完的时间 (秒)
+FLUSH_TIMEOUT = 30
+
+
+def _merge_patches(patches):
+    # 同一单元格多次修改只保留最早的旧值和最后的新值；来回改成原样的单元格直接丢掉
+    merged, cells = {"updates": [], "added": [], "deleted": []}, {}
+    for p in patches:
+        for pid, col, old, val in p["updates"]:
+            cells[(pid, col)] = (cells[(pid, col)][0], val) if (pid, col) in cells else (old, val)
+        merged["added"] += p["added"]
+        merged["deleted"] += p["deleted"]
+    versioned = "base" in patches[0]
+    merged["updates"] = [(pid, col, old, val) for (pid, col), (old, val) in cells.items() if not (versioned and _same(old, val))]
+    if versioned: merged["base"] = patches[0]["base"]
+    return merged
+
+def _in_workspace(fn):
+    # 队列方法都切到队列所属的工作区执行，与调用方 (或后台线程) 当前的工作区无关
+    @functools.wraps(fn)
+    def inner(self, *args, **kwargs):
+        with core.use_workspace(self.workspace, touch=False): return fn(self, *args, **kwargs)
+    return inner
+
+def _runs(batch):
+    # 相邻的同类改动合并成一组；带版本的表格补丁和不做并发检查的单项修改不混在一起，
+    # 新增行或改 项目编号 的补丁之后另起一组 (存储先按旧编号改行、最后才追加新行)
+    run, key = [], None
+    for item in batch:
+        op, payload = item[0], item[1]
+        k = (op, "base" in payload) if op == "patch" else op
+        if run and k != key:
+            yield key, run
+            run = []
+        run.append(item)
+        key = k
+        if op == "patch" and (payload["added"] or any(col == "项目编号" for _, col, _, _ in payload["updates"])):
+            yield key, run
+            run, key = [], None
+    if run: yield key, run
+
+
+class WriteBehind:
+    def __init__(self, workspace=DEFAULT_WORKSPACE):
+        # cond 保护队列，很短；lock 在一组改动写入期间持有，读取叠加视图时也要拿，避免看到"已落盘又叠加一次"的中间态
+        self.cond, self.lock = threading.Condition(), threading.RLock()
+        self.workspace, self.pending, self.notes_by_session, self.thread, self.closed = workspace, [], {}, None, False
+        # 队列每变一次 (提交、落盘或丢弃) 加一：叠加了排队改动的任务帧带着它 (attrs["overlay"])，按帧缓存的视图据此区分
+        self.version = 0
+        atexit.register(self.close)
+
+    # --- 提交 ---
+    def _submit(self, op, payload, session):
+        with self.cond:
+            if self.closed: raise RuntimeError("写入队列已关闭")
+            self.pending.append((op, payload, session))
+            self.version += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"command-center-writer-{self.workspace}", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def apply_patch(self, patch, session=None):
+        if not (patch["updates"] or patch["added"] or patch["deleted"]): return False
+        self._submit("patch", patch, session)
+        return True
+
+    def update_task(self, pid, fields, session=None):
+        self._submit("patch", {"updates": [(pid, col, None, val) for col, val in fields.items()], "added": [], "deleted": []}, session)
+
+    @_in_workspace
+    def add_task(self, row, subs=(), session=None):
+        # 子任务编号在提交时就领好，叠加视图和之后的编辑都能按编号对上
+        self._submit("tasks", [(row, core.assign_subtask_ids(row["项目编号"], subs))], session)
+
+    @_in_workspace
+    def save_subtasks(self, pid, subs, session=None):
+        # 勾选变化相对"当前看到的"子任务 (含排队中的改动) 计算，落盘时原样写入事件
+        subs = core.assign_subtask_ids(pid, subs)
+        old = {s["id"]: s["done"] for s in self.subtasks(pid)}
+        today = date.today().isoformat()
+        events = [(today, pid, s["id"], "done", int(s["done"])) for s in subs if old.get(s["id"], False) != s["done"]]
+        self._submit("progress", (events, {pid: subs}), session)
+
+    def save_log_entry(self, date_str, project, subtask, content, prog_incr, pid=None, sub_id=None, session=None):
+        self._submit("logs", [(date_str, project, subtask, content, prog_incr, pid, sub_id)], session)
+
+    # --- 后台写入 ---
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending: self.cond.wait()
+            time.sleep(WRITE_DELAY)
+            with self.lock:
+                with self.cond: batch = list(self.pending)
+                for key, run in _runs(batch): self._write(key, run)
+                with self.cond:
+                    del self.pending[:len(batch)]
+                    self.version += 1
+                    self.cond.notify_all()
+
+    @_in_workspace
+    def _write(self, key, run):
+        op, sessions = key[0] if isinstance(key, tuple) else key, {s for _, _, s in run}
+        try:
+            if op == "patch":
+                merged = _merge_patches([p for _, p, _ in run])
+                core.apply_patch(merged)
+                for pid in merged.get("conflicts", []):
+                    for s in {s for _, p, s in run if any(u[0] == pid for u in p["updates"])}:
+                        self._note(s, f"⚠️ {pid} 已被其他会话修改，这一行的改动未保存")
+                for dup in merged.get("duplicates", []):
+                    for s in {s for _, p, s in run if any(c == "项目编号" and str(v) == dup for _, c, _, v in p["updates"])
+                              or any(str(r.get("项目编号", "")) == dup for r in p["added"])}:
+                        self._note(s, f"⚠️ 项目编号 {dup or '(空)'} 已存在或重复，这一行的改动未保存")
+            elif op == "progress":
+                events, subtasks = [], {}
+                for _, (ev, subs), _ in run: events += ev; subtasks.update(subs)
+                core.record_progress(events, subtasks)
+            elif op == "tasks": core.add_tasks([item for _, items, _ in run for item in items])
+            elif op == "logs": core.save_log_entries([e for _, entries, _ in run for e in entries])
+        except Exception as e:
+            # 这一组改动丢弃：出队后叠加视图的版本随之变化，视图回到磁盘上的数据
+            for s in sessions: self._note(s, f"❌ 保存失败：{e}")
+
+    def _note(self, session, msg):
+        with self.cond: self.notes_by_session.setdefault(session, []).append(msg)
+
+    # --- 会话查询 ---
+    def busy(self, session=None):
+        # session 为 None 时看整个队列
+        with self.cond: return any(session is None or s == session for _, _, s in self.pending)
+
+    def notes(self, session=None):
+        with self.cond: return self.notes_by_session.pop(session, [])
+
+    def flush(self, timeout=None):
+        # 等队列写完；超时返回 False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.pending:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0: return False
+                self.cond.wait(left)
+        return True
+
+    def close(self):
+        with self.cond: self.closed = True
+        self.flush(FLUSH_TIMEOUT)
+
+    # --- 叠加视图 ---
+    def _snapshot(self, *ops):
+        with self.cond: return [(op, payload) for op, payload, _ in self.pending if op in ops]
+
+    @_in_workspace
+    def get_data(self):
+        if not self._snapshot("patch", "tasks", "progress", "logs"): return core.get_data()
+        with self.lock:
+            df = core.get_data()
+            with self.cond: queued, overlay = self._snapshot("patch", "tasks", "progress", "logs"), self.version
+            if not queued: return df
+            attrs = dict(df.attrs)
+            for op, payload in queued:
+                if op == "patch":
+                    for pid, col, _, val in payload["updates"]:
+                        if col in df.columns: set_task_cells(df, df["项目编号"] == pid, col, coerce_task_value(col, val))
+                    df = df[~df["项目编号"].isin(payload["deleted"])]
+                    rows = payload["added"]
+                elif op == "tasks": rows = [row for row, _ in payload]
+                else: rows = []
+                if rows: df = coerce_tasks(pd.concat([df, pd.DataFrame(rows)], ignore_index=True), TASK_LAZY_COLS)
+            # 排队中的勾选、子任务结构变化和日志贡献：预览它们落盘后的进度
+            progress = {}
+            for op, payload in queued:
+                if op == "logs": events = [(e[0], e[5], e[6] or "", "log", _contrib(e[4])) for e in payload if e[5] is not None]
+                elif op == "progress":
+                    events = payload[0]
+                    for pid, subs in payload[1].items(): progress.setdefault(pid, [[], None])[1] = subs
+                else: continue
+                for e in events: progress.setdefault(e[1], [[], None])[0].append(e)
+            for pid, (events, subs) in progress.items():
+                subs = subs if subs is not None else self.subtasks(pid)
+                df.loc[df["项目编号"] == pid, "当前进度(%)"] = core.preview_progress(pid, events, subs)
+            # 保存表格编辑时的版本检查仍以底层数据的版本为准
+            df.attrs.update(attrs, overlay=overlay)
+            return df
+
+    @_in_workspace
+    def get_note(self, pid):
+        note = core.get_note(pid)
+        for op, payload in self._snapshot("patch", "tasks"):
+            if op == "patch": note = next((str(val) for p, col, _, val in reversed(payload["updates"]) if p == pid and col == "专属笔记"), note)
+            else: note = next((str(row.get("专属笔记", "")) for row, _ in payload if row["项目编号"] == pid), note)
+        return note
+
+    @_in_workspace
+    def get_logs(self, since=None, until=None, project=None):
+        if not self._snapshot("logs"): return core.get_logs(since, until, project)
+        with self.lock:
+            logs, queued = core.get_logs(since, until, project), self._snapshot("logs")
+            rows = filter_logs(pd.DataFrame([e[:5] for _, entries in queued for e in entries], columns=LOG_COLS), since, until, project)
+            return pd.concat([logs, rows], ignore_index=True) if not rows.empty else logs
+
+    @_in_workspace
+    def subtasks(self, pid):
+        # 某个任务当前看到的子任务：排队中最后一次保存的版本，否则是已落盘的
+        with self.lock:
+            subs = core.get_subtask_store().for_task(pid)
+            for op, payload in self._snapshot("progress", "tasks"):
+                found = payload[1].get(pid) if op == "progress" else next((s for row, s in payload if row["项目编号"] == pid), None)
+                if found is not None: subs = found
+            return copy.deepcopy(subs)
+
+@resource
+def _write_behind(workspace): return WriteBehind(workspace)
+
+def get_write_behind(workspace=None): return _write_behind(core.current_workspace() if workspace is None else workspace)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import command_center as cc
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # 每个测试一个空的数据目录；进程级缓存按工作目录解析，切换后清掉
+    monkeypatch.chdir(tmp_path)
+    cc.clear_caches()
+    yield tmp_path
+    cc.get_write_behind().flush()
+    cc.clear_caches()
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pandas as pd
+
+import command_center as cc
+
+
+def _task(pid, name, subs):
+    cc.add_task({**cc.NEW_TASK_DEFAULTS, "任务名称": name, "类别": "学术", "项目编号": pid}, subs)
+    return [s["id"] for s in cc.get_subtask_store().for_task(pid)]
+
+def _stored(pid):
+    df = cc.get_data()
+    return int(df.loc[df["项目编号"] == pid, "当前进度(%)"].iloc[0])
+
+
+def test_rebuilt_engine_matches_live_after_reweight(workspace):
+    s1, s2 = _task("STUDY-01", "论文", [{"name": "s1", "weight": 50, "done": False}, {"name": "s2", "weight": 50, "done": False}])
+    today = date.today().isoformat()
+    cc.save_log_entry(today, "论文", "s1", "读文献", 50, pid="STUDY-01", sub_id=s1)
+    assert cc.task_progress("STUDY-01") == 50
+    cc.apply_patch({"updates": [("STUDY-01", "当前进度(%)", 50, 80)], "added": [], "deleted": []})
+    assert cc.task_progress("STUDY-01") == 80
+    cc.save_subtasks("STUDY-01", [{"id": s1, "name": "s1", "weight": 100, "done": False}, {"id": s2, "name": "s2", "weight": 100, "done": False}])
+    live = cc.task_progress("STUDY-01")
+    assert live == _stored("STUDY-01") == 55
+    cc.clear_caches()
+    assert cc.task_progress("STUDY-01") == _stored("STUDY-01") == live
+    assert cc.get_rollups().series("STUDY-01")["累计进度"].iloc[-1] == live
+
+def test_seeded_events_keep_stored_progress(workspace):
+    pd.DataFrame([{**cc.NEW_TASK_DEFAULTS, "任务名称": "健身", "类别": "兴趣", "当前进度(%)": 30, "项目编号": "LIFE-01",
+                   "任务分解JSON": '[{"id": "LIFE-01-01", "name": "跑步", "weight": 100, "done": false}]'}]).to_csv("life_data.csv", index=False)
+    pd.DataFrame([[date.today().isoformat(), "健身", "跑步", "5km", 10]], columns=cc.LOG_COLS).to_csv("project_logs.csv", index=False)
+    assert cc.task_progress("LIFE-01") == 30
+    cc.clear_caches()
+    assert cc.task_progress("LIFE-01") == 30
+    assert set(cc.get_storage().load_events()["事件"]) == {"log", "base"}
+
+def test_rebuild_reads_only_events_after_snapshot(workspace, monkeypatch):
+    monkeypatch.setattr(cc.core, "SNAPSHOT_EVERY", 10)
+    s1, = _task("STUDY-01", "论文", [{"name": "s1", "weight": 100, "done": False}])
+    for day in range(1, 26): cc.save_log_entry(f"2026-01-{day:02d}", "论文", "s1", "推进", 2, pid="STUDY-01", sub_id=s1)
+    live, as_of = cc.task_progress("STUDY-01"), cc.progress_as_of("STUDY-01", "2026-01-10")
+    storage, snap = cc.get_storage(), cc.get_storage().load_snapshot()
+    assert snap is not None and list(storage.load_events(snap)["序号"]) == list(range(snap["seq"] + 1, 26))
+    cc.clear_caches()
+    engine = cc.get_progress_engine()
+    assert engine.events is None and cc.task_progress("STUDY-01") == live == 50
+    assert cc.progress_as_of("STUDY-01", "2026-01-10") == as_of == 20
+    assert len(engine.history()) == 25
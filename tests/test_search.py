@@ -0,0 +1,19 @@
+from datetime import date, timedelta
+
+import command_center as cc
+from command_center import core
+
+
+def test_deep_search_reads_cold_segments_without_caching_them(workspace):
+    cc.add_task({**cc.NEW_TASK_DEFAULTS, "任务名称": "论文", "类别": "学术", "项目编号": "STUDY-01"})
+    old, today = (date.today() - timedelta(days=400)).isoformat(), date.today().isoformat()
+    cc.save_log_entry(old, "论文", "", "归档的旧实验", 0, pid="STUDY-01")
+    cc.save_log_entry(today, "论文", "", "最近的讨论", 0, pid="STUDY-01")
+    cc.compact_logs()
+    cc.clear_caches()
+    assert cc.search_tasks("旧实验") == []
+    assert [pid for pid, _, _ in cc.search_tasks("旧实验", include_optional=True)] == ["STUDY-01"]
+    assert [pid for pid, _, _ in cc.search_tasks("讨论", include_optional=True)] == ["STUDY-01"]
+    # 完整日志和冷段都没有留在进程缓存里
+    assert (cc.get_storage().name, "logs") not in core._file_cache(cc.current_workspace())["entries"]
+    assert not core._segment_cache()["entries"]
@@ -0,0 +1,20 @@
+import pandas as pd
+
+import command_center as cc
+
+
+def test_legacy_rows_keep_notes_and_subtasks_when_backfilled(workspace):
+    # 旧格式：缺 项目编号 的行，子任务内嵌在 任务分解JSON 列里
+    legacy = [{**cc.NEW_TASK_DEFAULTS, "任务名称": name, "类别": "学术", "项目编号": "", "专属笔记": note,
+               "任务分解JSON": f'[{{"id": "{sub}", "name": "{sub}", "weight": 100, "done": false}}]'}
+              for name, note, sub in [("论文", "重要笔记A", "s-a"), ("综述", "重要笔记B", "s-b")]]
+    pd.DataFrame(legacy).to_csv("life_data.csv", index=False)
+    df = cc.get_data()
+    pids = dict(zip(df["任务名称"], df["项目编号"]))
+    assert all(pids.values()) and len(set(pids.values())) == 2
+    cc.clear_caches()
+    assert cc.get_data()["项目编号"].tolist() == list(pids.values())
+    assert cc.get_note(pids["论文"]) == "重要笔记A" and cc.get_note(pids["综述"]) == "重要笔记B"
+    store = cc.get_subtask_store()
+    assert [s["id"] for s in store.for_task(pids["论文"])] == ["s-a"]
+    assert [s["id"] for s in store.for_task(pids["综述"])] == ["s-b"]
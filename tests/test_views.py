@@ -0,0 +1,31 @@
+import command_center as cc
+from command_center import writeback
+
+
+def _quadrant(df):
+    pids = tuple(df["项目编号"])
+    return cc.cached_view("quadrant", pids, lambda: cc.QuadrantIndex(df), df)
+
+def test_quadrant_view_follows_queued_writes(workspace, monkeypatch):
+    cc.add_task({**cc.NEW_TASK_DEFAULTS, "任务名称": "论文", "类别": "学术", "项目编号": "STUDY-01", "紧急性(1-10)": 5, "重要性(1-10)": 5})
+    writer = cc.get_write_behind()
+    assert set(_quadrant(writer.get_data()).cells) == {(5, 5)}
+    # 写入延迟拉长：改动留在队列里，界面只能通过叠加视图看到它
+    monkeypatch.setattr(writeback, "WRITE_DELAY", 0.5)
+    writer.update_task("STUDY-01", {"重要性(1-10)": 9}, session="a")
+    assert writer.busy("a")
+    assert set(_quadrant(writer.get_data()).cells) == {(5, 9)}
+    assert writer.flush(5)
+    assert set(_quadrant(writer.get_data()).cells) == {(5, 9)}
+
+def test_failed_write_drops_overlaid_view(workspace, monkeypatch):
+    cc.add_task({**cc.NEW_TASK_DEFAULTS, "任务名称": "论文", "类别": "学术", "项目编号": "STUDY-01", "紧急性(1-10)": 5, "重要性(1-10)": 5})
+    writer = cc.get_write_behind()
+    def fail(patch): raise OSError("磁盘已满")
+    monkeypatch.setattr(cc.core, "apply_patch", fail)
+    monkeypatch.setattr(writeback, "WRITE_DELAY", 0.5)
+    writer.update_task("STUDY-01", {"重要性(1-10)": 9}, session="a")
+    assert set(_quadrant(writer.get_data()).cells) == {(5, 9)}
+    assert writer.flush(5)
+    assert writer.notes("a") == ["❌ 保存失败：磁盘已满"]
+    assert set(_quadrant(writer.get_data()).cells) == {(5, 5)}